@@ -0,0 +1,99 @@
+# -----------------------------
+# article_store.py (per-PMID PubMed article documents shared by both services)
+# -----------------------------
+import asyncio
+from datetime import datetime, timezone
+from xml.etree import ElementTree
+
+from pymongo import UpdateOne
+
+from metrics import UPSTREAM_ERRORS, HitCounter
+
+EFETCH_CHUNK_SIZE = 200
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class ArticleStore:
+    """Parsed articles keyed by PMID (unique index), so efetch only runs for unseen PMIDs.
+
+    Works on an async (pymongo AsyncMongoClient) collection.
+    """
+
+    def __init__(self, collection, chunk_size=EFETCH_CHUNK_SIZE):
+        self.collection = collection
+        self.chunk_size = chunk_size
+        self.lookups = HitCounter()
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("pmid", unique=True)
+
+    async def get_many(self, pmids):
+        if not pmids:
+            return {}
+        cursor = self.collection.find({"pmid": {"$in": list(pmids)}}, {"_id": 0, "fetched_at": 0})
+        return {doc["pmid"]: doc async for doc in cursor}
+
+    async def put_many(self, articles):
+        now = datetime.now(timezone.utc)
+        ops = [
+            UpdateOne({"pmid": a["pmid"]}, {"$set": {**a, "fetched_at": now}}, upsert=True)
+            for a in articles if a.get("pmid")
+        ]
+        if ops:
+            await self.collection.bulk_write(ops, ordered=False)
+
+    async def fetch(self, pmids, eutils, timeout=None):
+        """Articles for pmids in request order; only PMIDs not yet stored go to efetch.
+
+        With eutils=None only stored articles are returned (no network). With a timeout,
+        efetch calls still running when it expires are cancelled and every article parsed
+        so far is kept, so a slow NCBI response shortens the result instead of failing it.
+        """
+        try:
+            found = await self.get_many(pmids)
+        except Exception as e:
+            print(f"⚠️ Article store read failed: {e}")
+            UPSTREAM_ERRORS.inc(upstream="mongo")
+            found = {}
+        missing = [p for p in dict.fromkeys(pmids) if p not in found]
+        self.lookups.record(hits=len(found), misses=len(missing))
+        if eutils is None:
+            return [found[p] for p in pmids if p in found]
+
+        fetched = []
+
+        async def fetch_chunk(chunk):
+            try:
+                async for article in eutils.aefetch_articles(chunk):
+                    fetched.append(article)
+            except ElementTree.ParseError as e:
+                # Keep whatever was parsed before the malformed part of the payload
+                print(f"⚠️ efetch returned malformed XML: {e}")
+
+        tasks = [asyncio.create_task(fetch_chunk(c)) for c in chunked(missing, self.chunk_size)]
+        if tasks:
+            try:
+                _, pending = await asyncio.wait(tasks, timeout=timeout)
+                if pending:
+                    print(f"⏱️ efetch budget ({timeout}s) reached with {len(pending)} chunk(s) pending")
+            finally:
+                for task in tasks:
+                    task.cancel()
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception():
+                    raise task.exception()
+        for article in fetched:
+            if article.get("pmid"):
+                found[article["pmid"]] = article
+        try:
+            await self.put_many(fetched)
+        except Exception as e:
+            print(f"⚠️ Article store write failed: {e}")
+            UPSTREAM_ERRORS.inc(upstream="mongo")
+
+        print(f"\nArticle store: {len(pmids) - len(missing)} stored, {len(fetched)} of {len(missing)} fetched")
+        return [found[p] for p in pmids if p in found]
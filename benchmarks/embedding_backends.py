@@ -0,0 +1,86 @@
+"""Parity check and speed benchmark for the pubmed_embeddings backends.
+
+    python benchmarks/embedding_backends.py [--backends torch torch-int8 onnx] [--texts 128] [--repeat 3]
+
+Every backend embeds the same texts. Cosine agreement is measured row by row against
+the torch fp32 baseline, and the script exits non-zero if any backend's worst row
+falls below --min-cosine.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pubmed_embeddings  # noqa: E402
+
+SAMPLE_TEXTS = [
+    "CRISPR-Cas9 gene editing for sickle cell disease",
+    "Long-term outcomes of immune checkpoint inhibitors in non-small cell lung cancer",
+    "Gut microbiome composition and response to metformin in type 2 diabetes",
+    "A randomized controlled trial of intermittent fasting for weight loss in adults with obesity",
+    "Mechanisms of antimicrobial resistance in Klebsiella pneumoniae carbapenemase producers",
+    "Tau aggregation and neuroinflammation in early Alzheimer's disease",
+    "mRNA vaccine efficacy against SARS-CoV-2 variants of concern",
+    "Deep learning for diabetic retinopathy screening from fundus photographs",
+    "Role of PCSK9 inhibitors in lowering LDL cholesterol in familial hypercholesterolemia",
+    "Prenatal exposure to air pollution and childhood asthma incidence",
+    "Single-cell RNA sequencing reveals heterogeneity of tumor-infiltrating T cells in melanoma. "
+    "We profiled more than ten thousand cells from treatment-naive patients and identified "
+    "exhausted and memory-like subsets whose ratio predicted response to anti-PD-1 therapy.",
+    "Hypertension control among older adults: a cohort study of blood pressure trajectories and "
+    "cardiovascular events over fifteen years of follow-up in a community-based population.",
+]
+
+
+def cosine_rows(a, b):
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    return np.sum(a * b, axis=1) / np.clip(norms, 1e-12, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(pubmed_embeddings.BACKENDS))
+    parser.add_argument("--model", default=pubmed_embeddings.MODEL_NAME)
+    parser.add_argument("--texts", type=int, default=128, help="number of texts per run")
+    parser.add_argument("--batch-size", type=int, default=pubmed_embeddings.EMBED_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(args.texts)]
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+
+    baseline, baseline_time, failed = None, None, False
+    print(f"{'backend':<12}{'load s':>9}{'best s':>9}{'texts/s':>10}{'speedup':>9}{'min cos':>9}{'mean cos':>10}")
+    for name in backends:
+        start = time.perf_counter()
+        backend = pubmed_embeddings.load_backend(name, model_name=args.model)
+        load_time = time.perf_counter() - start
+
+        pubmed_embeddings.embed_texts(texts[:args.batch_size], batch_size=args.batch_size, backend=backend)  # warm-up
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            embeddings = pubmed_embeddings.embed_texts(texts, batch_size=args.batch_size, backend=backend)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+
+        if baseline is None:
+            baseline, baseline_time = embeddings, best
+        cos = cosine_rows(embeddings, baseline)
+        if cos.min() < args.min_cosine:
+            failed = True
+        print(f"{name:<12}{load_time:>9.2f}{best:>9.3f}{len(texts) / best:>10.1f}"
+              f"{baseline_time / best:>8.2f}x{cos.min():>9.4f}{cos.mean():>10.4f}")
+
+    if failed:
+        print(f"\nFAIL: a backend fell below cosine {args.min_cosine} against torch fp32")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Latency of /search/semantic in both services, plus how much their top results agree.
+
+    python benchmarks/semantic_latency.py [--chatbot http://127.0.0.1:8002] [--advanced http://127.0.0.1:8000]
+        [--token JWT | --jwt-secret SECRET --user-id ID] [--repeat 3] [--concurrency 4] [--top-k 10]
+
+Every query is sent to each service --repeat times, with --concurrency requests in flight.
+The first round is cold (rewrites, articles and vectors not cached yet); later rounds are warm.
+For each service the script prints cold and warm p50/p95/mean latencies and the error count.
+It also prints the mean Jaccard overlap between the two services' top-k PMIDs per query.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+import jwt
+
+QUERIES = [
+    "CRISPR gene editing for sickle cell disease",
+    "immune checkpoint inhibitors in lung cancer",
+    "gut microbiome and metformin response",
+    "intermittent fasting and weight loss",
+    "carbapenem resistance in Klebsiella pneumoniae",
+    "tau and neuroinflammation in Alzheimer's disease",
+    "mRNA vaccine efficacy against SARS-CoV-2 variants",
+    "deep learning for diabetic retinopathy screening",
+]
+
+SERVICES = {
+    # name -> (request body, PMID field in each result)
+    "chatbot": (lambda q, k: {"query": q, "top_k": k}, "pmid"),
+    "advanced": (lambda q, k: {"query": q, "retmax": k}, "PMID"),
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def timed_search(client, url, body, pmid_field, semaphore):
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            response = await client.post(url, json=body)
+            response.raise_for_status()
+            pmids = [r.get(pmid_field) for r in response.json().get("results", [])]
+        except Exception as e:
+            print(f"  error from {url}: {e}", file=sys.stderr)
+            return None, []
+        return time.perf_counter() - start, pmids
+
+
+async def run_service(name, base_url, headers, args):
+    make_body, pmid_field = SERVICES[name]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    rounds, top = [], {}
+    async with httpx.AsyncClient(headers=headers, timeout=args.timeout) as client:
+        for _ in range(args.repeat):
+            results = await asyncio.gather(*(
+                timed_search(client, f"{base_url}/search/semantic", make_body(q, args.top_k), pmid_field, semaphore)
+                for q in QUERIES
+            ))
+            rounds.append([latency for latency, _ in results])
+            for q, (_, pmids) in zip(QUERIES, results):
+                top[q] = pmids or top.get(q, [])
+    return rounds, top
+
+
+def summarize(name, rounds):
+    errors = sum(latency is None for r in rounds for latency in r)
+    rows = [("cold", rounds[0]), ("warm", [x for r in rounds[1:] for x in r])]
+    for label, latencies in rows:
+        latencies = [x for x in latencies if x is not None]
+        if not latencies:
+            continue
+        print(f"{name:<10}{label:<6}{len(latencies):>4}{percentile(latencies, 50):>9.3f}"
+              f"{percentile(latencies, 95):>9.3f}{statistics.mean(latencies):>9.3f}")
+    return errors
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chatbot", default="http://127.0.0.1:8002")
+    parser.add_argument("--advanced", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", help="JWT to send; otherwise one is minted from --jwt-secret")
+    parser.add_argument("--jwt-secret", default=os.getenv("JWT_SECRET", "supersecretkey"))
+    parser.add_argument("--user-id", default="benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    token = args.token or jwt.encode({"id": args.user_id}, args.jwt_secret, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    results = {}
+    for name, url in (("chatbot", args.chatbot), ("advanced", args.advanced)):
+        results[name] = await run_service(name, url, headers, args)
+
+    print(f"{'service':<10}{'round':<6}{'n':>4}{'p50 s':>9}{'p95 s':>9}{'mean s':>9}")
+    errors = {name: summarize(name, rounds) for name, (rounds, _) in results.items()}
+    for name, count in errors.items():
+        if count:
+            print(f"{name}: {count} failed request(s)")
+
+    overlaps = []
+    for q in QUERIES:
+        a, b = (set(results[name][1].get(q, [])) for name in ("chatbot", "advanced"))
+        if a or b:
+            overlaps.append(len(a & b) / len(a | b))
+    if overlaps:
+        print(f"\nMean top-{args.top_k} PMID overlap (Jaccard) across {len(overlaps)} queries: {statistics.mean(overlaps):.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
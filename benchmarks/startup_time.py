@@ -0,0 +1,66 @@
+"""Import-time benchmark for the API modules.
+
+    python benchmarks/startup_time.py [--module chatbot_api] [--runs 5] [--top 15]
+
+Each run imports the module in a fresh interpreter with -X importtime. The script
+reports wall-clock import time (median/min) and the slowest imports, cumulative, of
+the last run. Placeholder GROQ_API/MONGO_URI values are set when missing, because
+importing chatbot_api requires them; no connection is made at import.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_once(module, env):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return elapsed, proc.stderr
+
+
+def slowest_imports(importtime_output, top):
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  <self us> | <cumulative us> | <module>"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="chatbot_api")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("GROQ_API", "benchmark")
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+    timings, output = [], ""
+    for _ in range(args.runs):
+        elapsed, output = import_once(args.module, env)
+        timings.append(elapsed)
+
+    print(f"import {args.module}: median {statistics.median(timings):.3f}s, min {min(timings):.3f}s over {args.runs} runs")
+    print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+    for cumulative_us, self_us, name in slowest_imports(output, args.top):
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
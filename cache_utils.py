@@ -0,0 +1,171 @@
+# -----------------------------
+# cache_utils.py (small in-process caches shared by both services)
+# -----------------------------
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional per-entry TTL and hit/miss counters."""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return entry[0] if entry is not None else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SemanticCache:
+    """LRU + TTL cache keyed by normalized text, with a nearest-neighbour fallback.
+
+    `get` tries the exact key first; if that misses and a query vector is given, the
+    entry whose vector has the highest cosine similarity at or above `threshold` is
+    returned instead. With `accept(key, candidate_key)`, only candidates it approves
+    can match, the most similar first. Entries stored without a vector only match exactly.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, threshold=0.92, accept=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.accept = accept
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (value, unit vector or None, expires_at)
+        self._matrix = None  # (keys, stacked unit vectors), rebuilt after writes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector):
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [k for k, (_, _, expires_at) in self._data.items() if expires_at is not None and expires_at <= now]
+        for k in expired:
+            del self._data[k]
+        if expired:
+            self._matrix = None
+
+    def _nearest(self, key, unit):
+        """Most similar accepted key at or above the threshold, or None."""
+        if self._matrix is None:
+            keys = [k for k, (_, vec, _) in self._data.items() if vec is not None]
+            self._matrix = (keys, np.stack([self._data[k][1] for k in keys]) if keys else None)
+        keys, matrix = self._matrix
+        if matrix is None:
+            return None
+        scores = matrix @ unit
+        for i in np.argsort(-scores, kind="stable"):
+            if scores[i] < self.threshold:
+                break
+            if self.accept is None or self.accept(key, keys[i]):
+                return keys[i]
+        return None
+
+    def get(self, key, vector=None):
+        """Return (value, match) where match is "exact", "semantic" or None on a miss."""
+        with self._lock:
+            self._expire()
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.exact_hits += 1
+                return self._data[key][0], "exact"
+            unit = self._unit(vector)
+            if unit is not None:
+                nearest = self._nearest(key, unit)
+                if nearest is not None:
+                    self._data.move_to_end(nearest)
+                    self.semantic_hits += 1
+                    return self._data[nearest][0], "semantic"
+            self.misses += 1
+            return None, None
+
+    def set(self, key, value, vector=None, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, self._unit(vector), expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._matrix = None
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[2] is None or entry[2] > time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._matrix = None
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
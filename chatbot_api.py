@@ -2,26 +2,40 @@
 # chatbot_api.py (FastAPI backend with user authentication & mode-specific endpoints)
 # -----------------------------
 from fastapi import FastAPI, HTTPException, Depends, Header, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import threading
 from pydantic import BaseModel
-from pymongo import MongoClient
-from groq import Groq
+from pymongo import AsyncMongoClient
+from groq import AsyncGroq
+import asyncio
 import datetime
+import time
 import warnings
 from fastapi.middleware.cors import CORSMiddleware
 from bson import ObjectId
 import jwt
+import json
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 import string
-import requests
-from xml.etree import ElementTree
-from transformers import AutoTokenizer, AutoModel
-import torch
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pubmed_eutils import EutilsClient
+from article_store import ArticleStore
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import chromadb
+import pubmed_embeddings
+from pubmed_embeddings import EMBEDDING_DIM, POOLING_VERSION, embed_texts
+from embedding_store import open_mongo_store, open_store, unit
+from cache_utils import LRUCache, SemanticCache
+from single_flight import SingleFlight, flight_key
+from mongo_indexes import ensure_indexes
+from write_behind import WriteBehindBuffer
+from hybrid_ranking import TermStats, bm25_scores, fuse, terms
+from keyword_ranking import STOPWORDS
+from metrics import (
+    CONTENT_TYPE, REGISTRY, STAGE_SECONDS, UPSTREAM_ERRORS, HitCounter, MetricsMiddleware, span, upstream_call,
+)
 from typing import Optional
 from datetime import timezone
 
@@ -42,26 +56,96 @@ if not groq_api_key or not mongo_uri:
 # 1. Configure Gemini API
 # -----------------------------
 GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+_genai = None
+
+def get_genai():
+    """Import and configure the Gemini SDK on first semantic search; chat modes never need it."""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        if GEMINI_API_KEY:
+            genai.configure(api_key=GEMINI_API_KEY)
+        _genai = genai
+    return _genai
 
 # -----------------------------
 # 2. Init Clients
 # -----------------------------
-client_groq = Groq(api_key=groq_api_key)
-mongo_client = MongoClient(mongo_uri)
+client_groq = AsyncGroq(api_key=groq_api_key)
+mongo_client = AsyncMongoClient(mongo_uri)
 db = mongo_client["pubmed_db"]
 collection = db["chatbot_articles"]
 users_collection = db["users"]
 semantic_collection = db["articles"]
+# Semantic-search result logs are batched off the request path (LOG_BATCH_SIZE / LOG_FLUSH_MS / LOG_QUEUE_SIZE)
+semantic_log = WriteBehindBuffer(semantic_collection)
+rewrite_collection = db["query_rewrites"]
+article_store = ArticleStore(db["pubmed_articles"])
+# NCBI's rate limit is per API key, which the advanced API and every replica share:
+# NCBI_RATE_LIMITER=mongo (default) meters all of them through ncbi_rate_slots,
+# =local gives this process its own full NCBI_RATE_LIMIT instead
+NCBI_RATE_LIMITER = os.getenv("NCBI_RATE_LIMITER", "mongo").lower()
+eutils = EutilsClient(api_key=os.getenv("NCBI_API_KEY"),
+                      rate_collection=db["ncbi_rate_slots"] if NCBI_RATE_LIMITER == "mongo" else None)
+
+# Identical concurrent requests share one upstream computation; SINGLE_FLIGHT_LOCKS=mongo
+# also makes other workers wait for it (lock documents in inflight_locks)
+SINGLE_FLIGHT_LOCKS = os.getenv("SINGLE_FLIGHT_LOCKS", "none").lower()
+single_flight = SingleFlight(db["inflight_locks"] if SINGLE_FLIGHT_LOCKS == "mongo" else None)
+
+# PubMedBERT inference gets its own small pool, sized independently of I/O concurrency,
+# so CPU-bound embedding work never queues behind (or starves) request handling
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+inference_in_flight = REGISTRY.gauge("inference_in_flight", "Calls queued or running on the inference executor")
+
+async def run_inference(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    inference_in_flight.inc()
+    try:
+        return await loop.run_in_executor(inference_executor, partial(fn, *args, **kwargs))
+    finally:
+        inference_in_flight.dec()
 
 # -----------------------------
 # 3. FastAPI App
 # -----------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await rewrite_collection.create_index("created_at", expireAfterSeconds=REWRITE_CACHE_TTL)
+    except Exception as e:
+        print(f"⚠️ Could not create query_rewrites TTL index: {e}")
+    await ensure_indexes(db, ["chatbot_articles"])
+    try:
+        await article_store.ensure_indexes()
+    except Exception as e:
+        print(f"⚠️ Could not create article store index: {e}")
+    try:
+        await single_flight.ensure_indexes()
+    except Exception as e:
+        print(f"⚠️ Could not create single-flight lock index: {e}")
+    try:
+        await eutils.ensure_indexes()
+    except Exception as e:
+        print(f"⚠️ Could not create NCBI rate-limit index: {e}")
+    embedding_batcher.start()
+    semantic_log.start()
+    # Warm the model after startup so the server accepts traffic immediately
+    if MODEL_WARMUP:
+        app.state.warmup = asyncio.create_task(warm_model())
+    yield
+    await embedding_batcher.stop()
+    await semantic_log.stop()
+    await eutils.aclose()
+    await mongo_client.close()
+    inference_executor.shutdown(wait=False)
+
 app = FastAPI(
     title="Biomedical Student Chatbot API",
     description="Mode-specific endpoints for Concept, Literature Review, Citation, Exam Notes",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -72,11 +156,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-route latency and in-flight requests for /metrics
+app.add_middleware(MetricsMiddleware)
 
 # -----------------------------
 # 4. Auth & Schemas
 # -----------------------------
-def get_current_user(authorization: str = Header(...)):
+async def get_current_user(authorization: str = Header(...)):
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization header")
     token = authorization.split(" ")[1]
@@ -99,11 +185,13 @@ class SemanticQuery(BaseModel):
     query: str
     top_k: Optional[int] = 10
     threshold: Optional[float] = 0.75
+    # "hybrid" merges esearch with local ANN candidates, "remote" is esearch only, "local" never calls out
+    source: Optional[str] = "hybrid"
 
 # -----------------------------
 # 5. Core Functions (Chatbot)
 # -----------------------------
-def generate_groq_response(prompt, mode):
+def groq_messages(prompt, mode):
     system_prompt = f"""
     You are a biomedical tutor chatbot for students.
     Mode: {mode}
@@ -113,110 +201,292 @@ def generate_groq_response(prompt, mode):
     - If mode is Exam Notes, write ~200 word concise notes with 2 references.
     Keep answers clear, student-friendly, and accurate.
     """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+async def generate_groq_response(prompt, mode):
     try:
-        response = client_groq.chat.completions.create(
+        with upstream_call("groq"):
+            response = await client_groq.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=groq_messages(prompt, mode),
+                temperature=0.7,
+                max_tokens=700,
+            )
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Groq API error: {str(e)}")
+
+async def stream_groq_response(prompt, mode):
+    """Yield answer tokens as Groq streams them."""
+    start = time.perf_counter()
+    first_token = True
+    with upstream_call("groq"):
+        stream = await client_groq.chat.completions.create(
             model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt},
-            ],
+            messages=groq_messages(prompt, mode),
             temperature=0.7,
             max_tokens=700,
+            stream=True,
         )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Groq API error: {str(e)}")
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token:
+                    STAGE_SECONDS.observe(time.perf_counter() - start, stage="groq_first_token")
+                    first_token = False
+                yield chunk.choices[0].delta.content
 
-def save_to_mongo(user_input, response, mode, user_id):
+async def save_to_mongo(user_input, response, mode, user_id):
     record = {
         "user_id": user_id,
         "mode": mode,
         "user_query": user_input,
+        # What the single-flight key and the cross-user peek match on
+        "normalized_query": preprocess_query(user_input),
         "llm_response": response,
         "timestamp": datetime.datetime.now(),
     }
-    return collection.insert_one(record).inserted_id
+    with span("mongo_insert"):
+        return (await collection.insert_one(record)).inserted_id
 
-def get_from_mongo(user_input, mode, user_id):
-    record = collection.find_one(
+async def get_from_mongo(user_input, mode, user_id):
+    record = await collection.find_one(
         {"user_id": user_id, "mode": mode, "user_query": user_input},
+        {"_id": 0, "llm_response": 1},
         sort=[("timestamp", -1)],
     )
     return record["llm_response"] if record else None
 
+# Opt-in, cross-user answer cache for the chat modes: an exact match on the normalized
+# question first, then the nearest cached question by PubMedBERT cosine similarity that
+# asks about the same subject. Mean-pooled PubMedBERT puts template questions close
+# together whatever their subject ("mechanism of metformin" / "of aspirin"), so the
+# cosine alone would hand out another drug's answer; words that only change how the
+# answer is asked for ("explain crispr simply") don't count as a different subject.
+# Semantic matching only runs once the embedding model is loaded; until then entries match exactly.
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", 0.92))
+CHAT_MODES = ("Concept", "Literature Review", "Citation", "Exam Notes")
+# How a question is phrased, not what it is about
+QUESTION_WORDS = frozenset({
+    "what", "is", "are", "was", "were", "how", "does", "do", "did", "why", "which", "who", "when", "where",
+    "explain", "describe", "define", "tell", "me", "about", "please", "can", "could", "you", "give",
+    "brief", "briefly", "overview", "summary", "summarize", "notes",
+})
+# Style modifiers (after plural folding): they shape the answer's register, not its subject
+STYLE_WORDS = frozenset({
+    "simply", "simple", "simpler", "easy", "easily", "plain", "layman", "beginner", "student", "kid",
+    "detail", "detailed", "depth", "short", "shortly", "quick", "quickly", "concise", "concisely",
+    "word", "term", "language", "way",
+})
+
+def content_terms(question):
+    """Topic words of a normalized question, plurals folded; single characters ("type 1", "T cells") count."""
+    return {t[:-1] if len(t) > 3 and t.endswith("s") else t
+            for t in question.split() if t not in QUESTION_WORDS and t not in STOPWORDS}
+
+def same_subject(question, cached_question):
+    """True if the two questions share their subject terms and differ at most in style modifiers."""
+    subject = content_terms(question) - STYLE_WORDS
+    return bool(subject) and subject == content_terms(cached_question) - STYLE_WORDS
+
+response_caches = {
+    mode: SemanticCache(
+        maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", 1024)),
+        ttl=int(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600)),
+        threshold=RESPONSE_CACHE_THRESHOLD,
+        accept=same_subject,
+    )
+    for mode in CHAT_MODES
+}
+
+async def question_embedding(user_input):
+    if not pubmed_embeddings.is_loaded():
+        return None
+    try:
+        return await embedding_batcher.embed(user_input)
+    except Exception as e:
+        print(f"⚠️ Response cache embedding failed: {e}")
+        return None
+
+async def lookup_answer(user_input, mode, user_id):
+    """Return (response or None, cache key, question vector) from the user's own history, then the shared cache."""
+    cached = await get_from_mongo(user_input, mode, user_id)
+    if cached:
+        return cached, None, None
+
+    key, vector = preprocess_query(user_input), None
+    if RESPONSE_CACHE:
+        cache = response_caches[mode]
+        if key not in cache:
+            vector = await question_embedding(user_input)
+        response, match = cache.get(key, vector)
+        if match:
+            await save_to_mongo(user_input, response, mode, user_id)
+            return response, key, vector
+    return None, key, vector
+
+async def store_answer(user_input, response, mode, user_id, key, vector, saved=False):
+    if not saved:
+        await save_to_mongo(user_input, response, mode, user_id)
+    if RESPONSE_CACHE:
+        response_caches[mode].set(key, response, vector)
+
+async def answer_chat(user_input, mode, user_id):
+    """Return (status, response) for a chat mode: the user's own history, then the shared cache, then Groq."""
+    with span("chat_lookup"):
+        cached, key, vector = await lookup_answer(user_input, mode, user_id)
+    if cached:
+        return "cached", cached
+
+    # Students asking the same question at once share one Groq call
+    normalized = preprocess_query(user_input)
+    started = datetime.datetime.now()
+
+    async def generate_and_save():
+        response = await generate_groq_response(user_input, mode)
+        # Saved inside the flight, i.e. before its lock is released, so workers
+        # waiting on the lock find the answer with their final peek
+        await save_to_mongo(user_input, response, mode, user_id)
+        return response, user_id
+
+    async def answered_elsewhere():
+        record = await collection.find_one(
+            {"mode": mode, "normalized_query": normalized, "timestamp": {"$gte": started}},
+            {"_id": 0, "llm_response": 1, "user_id": 1},
+            sort=[("timestamp", -1)],
+        )
+        return (record["llm_response"], record.get("user_id")) if record else None
+
+    response, saved_for = await single_flight.do(
+        flight_key("chat", mode, normalized), generate_and_save, peek=answered_elsewhere
+    )
+    # Every student gets the answer in their own history; the leader's copy is already saved
+    await store_answer(user_input, response, mode, user_id, key, vector, saved=saved_for == user_id)
+    return "new", response
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def stream_chat(user_input, mode, user_id):
+    """Server-sent events for a chat mode: a `status` event, `token` events, then `done` (or `error`).
+
+    Cached answers are sent as a single token event; a new answer is saved once Groq's
+    stream has finished, so an interrupted stream never ends up in Mongo or the cache.
+    """
+    with span("chat_lookup"):
+        cached, key, vector = await lookup_answer(user_input, mode, user_id)
+
+    async def events():
+        yield sse_event({"status": "cached" if cached else "new"}, "status")
+        if cached:
+            yield sse_event({"token": cached}, "token")
+            yield sse_event({"response": cached}, "done")
+            return
+        tokens = []
+        try:
+            async for token in stream_groq_response(user_input, mode):
+                tokens.append(token)
+                yield sse_event({"token": token}, "token")
+        except Exception as e:
+            yield sse_event({"detail": f"Groq API error: {str(e)}"}, "error")
+            return
+        response = "".join(tokens).strip()
+        await store_answer(user_input, response, mode, user_id, key, vector)
+        yield sse_event({"response": response}, "done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # -----------------------------
 # 6. Mode-specific Endpoints (Chatbot)
 # -----------------------------
 @app.post("/concept")
-def concept_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
+async def concept_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
     user_id = user['user_id']
     mode = "Concept"
     user_input = request.user_input.strip()
     if not user_input:
         raise HTTPException(status_code=400, detail="User input cannot be empty")
 
-    cached = get_from_mongo(user_input, mode, user_id)
-    if cached:
-        return {"status": "cached", "response": cached}
-
-    response = generate_groq_response(user_input, mode)
-    save_to_mongo(user_input, response, mode, user_id)
-    return {"status": "new", "response": response}
+    status, response = await answer_chat(user_input, mode, user_id)
+    return {"status": status, "response": response}
 
 @app.post("/literature_review")
-def literature_review_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
+async def literature_review_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
     user_id = user['user_id']
     mode = "Literature Review"
     user_input = request.user_input.strip()
     if not user_input:
         raise HTTPException(status_code=400, detail="User input cannot be empty")
 
-    cached = get_from_mongo(user_input, mode, user_id)
-    if cached:
-        return {"status": "cached", "response": cached}
-
-    response = generate_groq_response(user_input, mode)
-    save_to_mongo(user_input, response, mode, user_id)
-    return {"status": "new", "response": response}
+    status, response = await answer_chat(user_input, mode, user_id)
+    return {"status": status, "response": response}
 
 @app.post("/citation")
-def citation_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
+async def citation_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
     user_id = user['user_id']
     mode = "Citation"
     user_input = request.user_input.strip()
     if not user_input:
         raise HTTPException(status_code=400, detail="User input cannot be empty")
 
-    cached = get_from_mongo(user_input, mode, user_id)
-    if cached:
-        return {"status": "cached", "response": cached}
-
-    response = generate_groq_response(user_input, mode)
-    save_to_mongo(user_input, response, mode, user_id)
-    return {"status": "new", "response": response}
+    status, response = await answer_chat(user_input, mode, user_id)
+    return {"status": status, "response": response}
 
 @app.post("/exam_notes")
-def exam_notes_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
+async def exam_notes_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
     user_id = user['user_id']
     mode = "Exam Notes"
     user_input = request.user_input.strip()
     if not user_input:
         raise HTTPException(status_code=400, detail="User input cannot be empty")
 
-    cached = get_from_mongo(user_input, mode, user_id)
-    if cached:
-        return {"status": "cached", "response": cached}
+    status, response = await answer_chat(user_input, mode, user_id)
+    return {"status": status, "response": response}
 
-    response = generate_groq_response(user_input, mode)
-    save_to_mongo(user_input, response, mode, user_id)
-    return {"status": "new", "response": response}
+# Streaming (SSE) variants: same lookup and persistence, tokens forwarded as Groq produces them
+@app.post("/concept/stream")
+async def concept_stream_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
+    user_input = request.user_input.strip()
+    if not user_input:
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+    return await stream_chat(user_input, "Concept", user['user_id'])
+
+@app.post("/literature_review/stream")
+async def literature_review_stream_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
+    user_input = request.user_input.strip()
+    if not user_input:
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+    return await stream_chat(user_input, "Literature Review", user['user_id'])
+
+@app.post("/citation/stream")
+async def citation_stream_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
+    user_input = request.user_input.strip()
+    if not user_input:
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+    return await stream_chat(user_input, "Citation", user['user_id'])
+
+@app.post("/exam_notes/stream")
+async def exam_notes_stream_endpoint(request: ChatRequest, user: dict = Depends(get_current_user)):
+    user_input = request.user_input.strip()
+    if not user_input:
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+    return await stream_chat(user_input, "Exam Notes", user['user_id'])
 
 # -----------------------------
 # 7. Semantic Search Functions
 # -----------------------------
-def generate_gemini_response_for_search(prompt):
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    response = model.generate_content(prompt)
+async def generate_gemini_response_for_search(prompt):
+    model = get_genai().GenerativeModel("gemini-1.5-flash")
+    with upstream_call("gemini"):
+        response = await model.generate_content_async(prompt)
     return response.text
 
 def preprocess_query(query):
@@ -225,7 +495,7 @@ def preprocess_query(query):
     query = " ".join(query.split())
     return query
 
-def get_core_concepts_with_boolean(user_query):
+async def get_core_concepts_with_boolean(user_query):
     user_query_clean = preprocess_query(user_query)
     prompt = f"""
     You are an expert research assistant.
@@ -250,7 +520,7 @@ def get_core_concepts_with_boolean(user_query):
 
     User query: "{user_query_clean}"
     """
-    response_text = generate_gemini_response_for_search(prompt)
+    response_text = await generate_gemini_response_for_search(prompt)
     print("\n🔹 Core Concepts + Optimized Boolean Query 🔹")
     print(response_text)
 
@@ -259,7 +529,7 @@ def get_core_concepts_with_boolean(user_query):
         return optimized_query
     return None
 
-def get_mesh_boolean_from_prompt(optimized_query):
+async def get_mesh_boolean_from_prompt(optimized_query):
     optimized_query_clean = preprocess_query(optimized_query)
     prompt = f"""
     You are an expert PubMed search assistant.
@@ -277,95 +547,383 @@ def get_mesh_boolean_from_prompt(optimized_query):
 
     Output ONLY the final MeSH-aware Boolean query.
     """
-    response_text = generate_gemini_response_for_search(prompt)
+    response_text = await generate_gemini_response_for_search(prompt)
     print("\n🔹 MeSH-aware Boolean Query 🔹")
     print(response_text)
     return response_text
 
-def pubmed_esearch(mesh_query, retmax=10):
-    esearch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-    params = {"db": "pubmed", "term": mesh_query, "retmax": retmax, "retmode": "xml"}
-    response = requests.get(esearch_url, params=params)
-    root = ElementTree.fromstring(response.content)
-    pmids = [id_elem.text for id_elem in root.findall(".//Id")]
+# Two-tier cache for Gemini query rewrites: in-process LRU in front of a Mongo TTL collection
+REWRITE_CACHE_TTL = int(os.getenv("REWRITE_CACHE_TTL", 7 * 24 * 3600))
+rewrite_cache = LRUCache(maxsize=int(os.getenv("REWRITE_CACHE_SIZE", 2048)), ttl=REWRITE_CACHE_TTL)
+rewrite_mongo_stats = HitCounter()
+
+async def rewrite_query(user_query):
+    """Return (optimized_query, mesh_query) for a user query, calling Gemini only on a cache miss."""
+    key = preprocess_query(user_query)
+    cached = rewrite_cache.get(key)
+    if cached:
+        return cached
+
+    try:
+        record = await rewrite_collection.find_one({"_id": key}, {"optimized_query": 1, "mesh_query": 1})
+    except Exception as e:
+        print(f"⚠️ Rewrite cache read failed: {e}")
+        UPSTREAM_ERRORS.inc(upstream="mongo")
+        record = None
+    if record:
+        rewrite_mongo_stats.record(hits=1)
+        rewritten = (record["optimized_query"], record["mesh_query"])
+        rewrite_cache.set(key, rewritten)
+        return rewritten
+    rewrite_mongo_stats.record(misses=1)
+
+    concepts_query = await get_core_concepts_with_boolean(user_query)
+    optimized_query = concepts_query or user_query
+    mesh_query = await get_mesh_boolean_from_prompt(optimized_query)
+    rewritten = (optimized_query, mesh_query)
+
+    # Don't pin a failed concept extraction for the whole TTL
+    if concepts_query:
+        rewrite_cache.set(key, rewritten)
+        try:
+            await rewrite_collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "optimized_query": optimized_query,
+                    "mesh_query": mesh_query,
+                    "created_at": datetime.datetime.now(timezone.utc),
+                }},
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"⚠️ Rewrite cache write failed: {e}")
+            UPSTREAM_ERRORS.inc(upstream="mongo")
+    return rewritten
+
+async def pubmed_esearch(mesh_query, retmax=10):
+    pmids = await eutils.aesearch(mesh_query, retmax=retmax)
     print("\nRetrieved PMIDs:", pmids)
     return pmids
 
-def pubmed_efetch(pmids):
-    efetch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
-    params = {"db": "pubmed", "id": ",".join(pmids), "retmode": "xml"}
-    response = requests.get(efetch_url, params=params)
-    root = ElementTree.fromstring(response.content)
+async def pubmed_efetch(pmids, local_only=False, timeout=None):
     articles = []
-
-    for article in root.findall(".//PubmedArticle"):
-        pmid = article.findtext(".//PMID")
-        title = article.findtext(".//ArticleTitle")
-        abstract = article.findtext(".//AbstractText")
-        journal = article.findtext(".//Journal/Title")
+    # Stored PMIDs come from Mongo; only the rest are efetched (streamed, 200 per call)
+    for article in await article_store.fetch(pmids, None if local_only else eutils, timeout=timeout):
+        pmid = article["pmid"]
         link = f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/" if pmid else None
         articles.append({
             "pmid": pmid,
-            "title": title,
-            "abstract": abstract,
-            "journal": journal,
+            "title": article["title"],
+            "abstract": article["abstract"],
+            "journal": article["journal"],
             "link": link
         })
     return articles
 
+# Speculative fallbacks: fire the MeSH, optimized and raw esearch together instead of one after another
+SPECULATIVE_ESEARCH = os.getenv("SPECULATIVE_ESEARCH", "true").lower() == "true"
+# Start the raw-query esearch while the Gemini rewrites are still running
+PREFETCH_RAW_ESEARCH = os.getenv("PREFETCH_RAW_ESEARCH", "true").lower() == "true"
+ESEARCH_DEADLINE = float(os.getenv("ESEARCH_DEADLINE", 8))
+
+async def first_nonempty_esearch(queries, retmax=80, deadline=ESEARCH_DEADLINE, started=None):
+    """Run esearch for all queries concurrently and return (query, pmids) for the
+    highest-priority query that found PMIDs, or (None, []).
+
+    `queries` are in priority order; `started` maps a query to an already-running
+    esearch task. Searches still pending once the answer is known, or when the
+    deadline passes, are cancelled. With the shared limiter (NCBI_RATE_LIMITER=mongo,
+    the default) a search reserves its slot before waiting for it, so a cancelled one
+    still spends a request of the key's budget; with the local bucket, one cancelled
+    while waiting spends nothing.
+    """
+    started = started or {}
+    queries = list(dict.fromkeys(q for q in queries if q))
+    tasks = [started.get(q) or asyncio.create_task(eutils.aesearch(q, retmax=retmax)) for q in queries]
+    results = [None] * len(tasks)
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + deadline
+
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0, give_up_at - loop.time()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                print(f"\n⏱️ esearch deadline ({deadline}s) reached with {len(pending)} queries pending")
+                break
+            for task in done:
+                i = tasks.index(task)
+                try:
+                    results[i] = task.result()
+                except Exception as e:
+                    print(f"⚠️ esearch failed for {queries[i]!r}: {e}")
+                    results[i] = []
+
+            # An answer is final once every higher-priority query has come back empty
+            for i, pmids in enumerate(results):
+                if pmids is None:
+                    break
+                if pmids:
+                    return queries[i], pmids
+
+        # Deadline hit: settle for the best query that did answer
+        for i, pmids in enumerate(results):
+            if pmids:
+                return queries[i], pmids
+        return None, []
+    finally:
+        for task in tasks:
+            task.cancel()
+
 # -----------------------------
 # 8. PubMedBERT Embeddings
 # -----------------------------
-model_name = "microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract-fulltext"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModel.from_pretrained(model_name)
+# EMBEDDING_BACKEND selects torch (fp32), torch-int8 or onnx; see pubmed_embeddings.py.
+# The backend loads on first use, or in the background right after startup with MODEL_WARMUP.
+model_name = pubmed_embeddings.MODEL_NAME
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+model_state = {"status": "cold", "error": None, "load_seconds": None}
 
 def get_embedding(text):
     if not text:
-        return np.zeros(768)
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
-    with torch.no_grad():
-        outputs = model(**inputs)
-        token_embeddings = outputs.last_hidden_state
-        attention_mask = inputs['attention_mask']
-        mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-        sum_embeddings = torch.sum(token_embeddings * mask_expanded, 1)
-        sum_mask = torch.clamp(mask_expanded.sum(1), min=1e-9)
-        mean_pooling = sum_embeddings / sum_mask
-        return mean_pooling.squeeze().numpy()
+        return np.zeros(EMBEDDING_DIM)
+    return embed_texts([text])[0]
+
+class EmbeddingBatcher:
+    """Micro-batches query embeddings across concurrent requests.
+
+    Callers await `embed(text)`; a single consumer task gathers queued texts for up to
+    `max_wait_ms` or `max_batch` items, runs them through the model as one padded batch
+    on the inference executor, and resolves each caller's future.
+    """
+
+    def __init__(self, max_batch=32, max_wait_ms=5):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.task = None
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def embed(self, text):
+        if not text:
+            return np.zeros(EMBEDDING_DIM)
+        with span("query_embedding"):
+            if self.task is None:
+                return await run_inference(get_embedding, text)
+            future = asyncio.get_running_loop().create_future()
+            await self.queue.put((text, future))
+            return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        flush_at = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = flush_at - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Skip callers that gave up (cancelled) while waiting
+        return [(text, fut) for text, fut in batch if not fut.done()]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            try:
+                embeddings = await run_inference(embed_texts, [text for text, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (_, fut), emb in zip(batch, embeddings):
+                if not fut.done():
+                    fut.set_result(emb)
+
+embedding_batcher = EmbeddingBatcher(
+    max_batch=int(os.getenv("QUERY_BATCH_SIZE", 32)),
+    max_wait_ms=float(os.getenv("QUERY_BATCH_WAIT_MS", 5)),
+)
 
 # -----------------------------
 # 9. ChromaDB Setup
 # -----------------------------
-chroma_client = chromadb.PersistentClient(path="./chroma_store")
-chroma_collection = chroma_client.get_or_create_collection("pubmed_articles")
+_embedding_store = None
+_chroma_lock = threading.Lock()
+
+def get_embedding_store():
+    global _embedding_store
+    if _embedding_store is None:
+        with _chroma_lock:
+            if _embedding_store is None:
+                # Mirror every vector into Mongo so the advanced API can rank with them too
+                mirror = open_mongo_store(mongo_uri, model_name, POOLING_VERSION) if mongo_uri else None
+                _embedding_store = open_store(model_name, POOLING_VERSION, mirror=mirror)
+    return _embedding_store
+
+def load_semantic_stack():
+    """Load the embedding backend and Chroma, then run one tiny batch so the first request is warm."""
+    start = datetime.datetime.now()
+    pubmed_embeddings.get_backend()
+    get_embedding_store()
+    embed_texts(["warmup"])
+    return (datetime.datetime.now() - start).total_seconds()
+
+async def warm_model():
+    model_state["status"] = "loading"
+    try:
+        model_state["load_seconds"] = await run_inference(load_semantic_stack)
+        model_state["status"] = "ready"
+        print(f"✅ Semantic stack warm in {model_state['load_seconds']:.1f}s")
+    except Exception as e:
+        model_state.update(status="failed", error=str(e))
+        print(f"⚠️ Model warmup failed: {e}")
 
 # -----------------------------
 # 10. Semantic Rerank (Improved)
 # -----------------------------
-def get_article_embedding(article, title_weight=0.7, abstract_weight=0.3):
-    """Embed title + abstract with weights."""
-    title_emb = get_embedding(article.get("title", "") or "")
-    abstract_emb = get_embedding(article.get("abstract", "") or "")
+# Staged retrieval: a deep esearch pool is cut down by BM25 before PubMedBERT sees it.
+# CANDIDATE_POOL PMIDs are fetched (within FETCH_BUDGET seconds), the RERANK_K best by BM25
+# plus every candidate with stored vectors go on to dense scoring, and uncached survivors
+# are embedded RERANK_BATCH at a time until RERANK_BUDGET seconds have passed.
+CANDIDATE_POOL = int(os.getenv("CANDIDATE_POOL", 500))
+RERANK_K = int(os.getenv("RERANK_K", 80))
+RERANK_BATCH = int(os.getenv("RERANK_BATCH", 32))
+FETCH_BUDGET = float(os.getenv("FETCH_BUDGET", 6))
+RERANK_BUDGET = float(os.getenv("RERANK_BUDGET", 8))
 
-    # Weighted sum
-    weighted_emb = title_weight * title_emb + abstract_weight * abstract_emb
-    return weighted_emb
+def get_cached_embeddings(articles):
+    try:
+        return get_embedding_store().get_many([a.get("pmid") for a in articles])
+    except Exception as e:
+        print(f"⚠️ Embedding cache read failed: {e}")
+        UPSTREAM_ERRORS.inc(upstream="chroma")
+        return {}
 
-def semantic_rerank(user_query, articles, top_k=5, threshold=0.85, title_weight=0.7, abstract_weight=0.3):
-    query_embedding = get_embedding(user_query)
-    article_embeddings = [
-        get_article_embedding(a, title_weight=title_weight, abstract_weight=abstract_weight)
-        for a in articles
-    ]
+def get_article_embeddings(articles, cached=None, deadline=None):
+    """Title and abstract matrices for articles; cached PMIDs skip the model, misses are written back.
+
+    Misses are embedded RERANK_BATCH articles at a time; once `deadline` (time.monotonic())
+    has passed, the remaining rows stay zero, i.e. unscored.
+    """
+    n = len(articles)
+    titles = np.zeros((n, EMBEDDING_DIM), dtype=np.float32)
+    abstracts = np.zeros((n, EMBEDDING_DIM), dtype=np.float32)
+
+    if cached is None:
+        cached = get_cached_embeddings(articles)
+
+    misses = []
+    for i, a in enumerate(articles):
+        hit = cached.get(a.get("pmid"))
+        if hit is not None:
+            titles[i], abstracts[i] = hit
+        else:
+            misses.append(i)
+    print(f"\nEmbedding cache: {n - len(misses)} hits, {len(misses)} misses")
+
+    embedded = []
+    for start in range(0, len(misses), RERANK_BATCH):
+        if deadline is not None and time.monotonic() > deadline:
+            print(f"⏱️ Rerank budget reached: {len(misses) - start} of {len(misses)} misses left unscored")
+            break
+        batch = misses[start:start + RERANK_BATCH]
+        # Titles and abstracts go through the model together, then split back apart
+        texts = [articles[i].get("title", "") or "" for i in batch] + \
+                [articles[i].get("abstract", "") or "" for i in batch]
+        with span("embedding"):
+            # Unit rows, like the stored vectors, so hits and misses weigh title vs abstract the same
+            embeddings = unit(embed_texts(texts))
+        m = len(batch)
+        titles[batch] = embeddings[:m]
+        abstracts[batch] = embeddings[m:]
+        embedded.extend(batch)
+    if embedded:
+        try:
+            get_embedding_store().put_many({articles[i].get("pmid"): (titles[i], abstracts[i]) for i in embedded})
+        except Exception as e:
+            print(f"⚠️ Embedding cache write failed: {e}")
+            UPSTREAM_ERRORS.inc(upstream="chroma")
 
-    sims = cosine_similarity([query_embedding], article_embeddings)[0]
+    return titles, abstracts
 
-    # attach similarity score
-    ranked = sorted(zip(articles, sims), key=lambda x: x[1], reverse=True)
+def cosine_scores(query_embedding, matrix):
+    """Cosine similarity of one vector against every row; zero vectors score 0."""
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_embedding)
+    dots = matrix @ query_embedding
+    return np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
 
-    # filter low-similarity matches
-    ranked = [(a, s) for a, s in ranked if s >= threshold]
+# Hybrid ranking: BM25 over the candidates' titles/abstracts fused with the dense cosine.
+# HYBRID_FUSION = rrf (reciprocal rank), weighted (HYBRID_ALPHA * dense + (1 - alpha) * BM25) or dense (cosine only)
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "rrf")
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", 0.5))
+RRF_K = int(os.getenv("RRF_K", 60))
+term_stats = TermStats()
+
+def prefilter_candidates(user_query, articles, k=RERANK_K):
+    """Stage 1 of staged retrieval: keep the k best candidates by BM25 (ties keep esearch order),
+    plus every candidate whose vectors are already stored, since those cost no model time.
+
+    Returns (survivors, cached vectors by PMID) for semantic_rerank.
+    """
+    cached = get_cached_embeddings(articles)
+    if len(articles) <= k:
+        return articles, cached
+    with span("prefilter"):
+        sparse, _ = bm25_scores(terms(user_query), [term_stats.get(a) for a in articles])
+        order = np.argsort(-sparse, kind="stable")
+    survivors = [articles[i] for i in order[:k]] + [articles[i] for i in order[k:] if articles[i].get("pmid") in cached]
+    print(f"\nPrefilter: {len(articles)} candidates -> {len(survivors)} ({len(cached)} with stored vectors)")
+    return survivors, cached
+
+def semantic_rerank(user_query, articles, top_k=5, threshold=0.85, title_weight=0.7, abstract_weight=0.3,
+                    query_embedding=None, cached=None, deadline=None):
+    if not articles:
+        return []
+    if query_embedding is None:
+        query_embedding = get_embedding(user_query)
+
+    # Articles left unembedded at the deadline come back as zero rows: no dense score
+    titles, abstracts = get_article_embeddings(articles, cached=cached, deadline=deadline)
+    article_embeddings = title_weight * titles + abstract_weight * abstracts
+    unscored = ~article_embeddings.any(axis=1)
+
+    with span("ranking"):
+        sims = cosine_scores(query_embedding, article_embeddings)
+        # filter low-similarity matches; the threshold can't judge unscored articles, so BM25 ranks them
+        scores, keep = sims, sims >= threshold
+        if HYBRID_FUSION != "dense" or unscored.any():
+            sparse, coverage = bm25_scores(terms(user_query), [term_stats.get(a) for a in articles])
+            # ... but only those sharing at least one term with the query
+            keep |= unscored & ((sparse > 0) | (coverage > 0))
+        if HYBRID_FUSION != "dense":
+            # Unscored articles get the median dense score, so only their BM25 moves them
+            dense = np.where(unscored, np.median(sims[~unscored]), sims) if not unscored.all() else sims
+            scores = fuse(dense, sparse, HYBRID_FUSION, HYBRID_ALPHA, RRF_K)
+            # ... and keep articles containing every query term
+            keep |= coverage == 1
+            order = np.argsort(-scores, kind="stable")
+        elif unscored.any():
+            # Dense only: scored articles by cosine, then the unscored ones by BM25
+            order = np.lexsort((-sparse, -sims, unscored))
+        else:
+            order = np.argsort(-sims, kind="stable")
+    ranked = [(articles[i], float(scores[i])) for i in order if keep[i]]
 
     return ranked[:top_k]
 
@@ -373,55 +931,172 @@ def semantic_rerank(user_query, articles, top_k=5, threshold=0.85, title_weight=
 # 11. API Endpoint: Semantic Search
 # -----------------------------
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+async def health():
+    """Readiness probe: 503 while the background warmup is running or has failed."""
+    if pubmed_embeddings.is_loaded() and model_state["status"] != "ready":
+        model_state["status"] = "ready"  # loaded lazily by a request rather than the warmup
+    ready = model_state["status"] == "ready" or not MODEL_WARMUP
+    body = {"status": "ok" if ready else "warming", "model": dict(model_state)}
+    return body if ready else JSONResponse(status_code=503, content=body)
 
-@app.post("/search/semantic")
-def search_semantic(body: SemanticQuery, user: dict = Depends(get_current_user)):
+async def esearch_candidates(query):
+    """Gemini rewrite + PubMed esearch with fallbacks; returns (optimized_query, mesh_query, pmids)."""
+    raw_task = None
     try:
+        if SPECULATIVE_ESEARCH and PREFETCH_RAW_ESEARCH:
+            raw_task = asyncio.create_task(eutils.aesearch(query, retmax=CANDIDATE_POOL))
+
         # 1) Gemini optimized + MeSH-aware
-        optimized_query = get_core_concepts_with_boolean(body.query) or body.query
-        mesh_query = get_mesh_boolean_from_prompt(optimized_query) if optimized_query else body.query
+        with span("rewrite"):
+            optimized_query, mesh_query = await rewrite_query(query)
 
         # 2) PubMed search with fallbacks
-        pmids = pubmed_esearch(mesh_query, retmax=80)
-        if not pmids:
-            pmids = pubmed_esearch(optimized_query, retmax=80)
-        if not pmids:
-            pmids = pubmed_esearch(body.query, retmax=80)
-        if not pmids:
-            return {"source": "api", "results": [], "message": "No articles found"}
-
-        # 3) Fetch & rerank
-        articles = pubmed_efetch(pmids[:80])
-        ranked = semantic_rerank(body.query, articles, top_k=body.top_k or 10, threshold=body.threshold or 0.75)
-        articles_only = [a for a, _ in ranked]
+        with span("esearch"):
+            if SPECULATIVE_ESEARCH:
+                started = {query: raw_task} if raw_task else {}
+                _, pmids = await first_nonempty_esearch(
+                    [mesh_query, optimized_query, query], retmax=CANDIDATE_POOL, started=started
+                )
+                print(f"\nRetrieved {len(pmids)} PMIDs")
+            else:
+                pmids = await pubmed_esearch(mesh_query, retmax=CANDIDATE_POOL)
+                if not pmids:
+                    pmids = await pubmed_esearch(optimized_query, retmax=CANDIDATE_POOL)
+                if not pmids:
+                    pmids = await pubmed_esearch(query, retmax=CANDIDATE_POOL)
+        return optimized_query, mesh_query, pmids
+    finally:
+        if raw_task:
+            raw_task.cancel()
+
+# Local retrieval: ANN over every article already embedded into the pubmed_articles Chroma collection
+LOCAL_ANN_K = int(os.getenv("LOCAL_ANN_K", 40))
+# In hybrid mode, give up on Gemini + esearch after this long and answer from the local corpus
+REMOTE_DEADLINE = float(os.getenv("REMOTE_DEADLINE", 10))
+
+async def local_candidates(query_task, k=LOCAL_ANN_K):
+    # shield: the query embedding is shared with the rerank step
+    query_embedding = await asyncio.shield(query_task)
+    with span("local_ann"):
+        pmids = await run_inference(lambda: get_embedding_store().nearest(query_embedding, k))
+    return pmids
+
+async def semantic_search(body: SemanticQuery, mode):
+    """Retrieve and rerank for one query; returns (source, optimized_query, mesh_query, articles)."""
+    # The query embedding is batched with other in-flight searches while Gemini and NCBI run
+    query_task = asyncio.create_task(embedding_batcher.embed(body.query))
+    remote_task = asyncio.create_task(esearch_candidates(body.query)) if mode != "local" else None
+    local_task = asyncio.create_task(local_candidates(query_task)) if mode != "remote" else None
+    try:
+        optimized_query = mesh_query = None
+        pmids, local_pmids, remote_ok = [], [], False
+        if remote_task:
+            try:
+                optimized_query, mesh_query, pmids = await asyncio.wait_for(
+                    remote_task, timeout=REMOTE_DEADLINE if local_task else None
+                )
+                remote_ok = True
+            except Exception as e:
+                if not local_task:
+                    raise
+                print(f"⚠️ PubMed path failed ({e!r}); answering from the local corpus")
+        if local_task:
+            try:
+                local_pmids = await local_task
+            except Exception as e:
+                if not remote_ok:
+                    raise
+                print(f"⚠️ Local ANN lookup failed: {e}")
+
+        candidates = list(dict.fromkeys(pmids[:CANDIDATE_POOL] + local_pmids))
+        if not candidates:
+            return "api", optimized_query, mesh_query, None
+        source = "api" if not local_pmids else ("hybrid" if remote_ok else "local")
+
+        # 3) Fetch & rerank; without a working PubMed path only stored articles are used
+        with span("efetch"):
+            articles = await pubmed_efetch(candidates, local_only=not remote_ok, timeout=FETCH_BUDGET)
+        survivors, cached = await run_inference(prefilter_candidates, body.query, articles)
+        ranked = await run_inference(
+            semantic_rerank, body.query, survivors, top_k=body.top_k or 10, threshold=body.threshold or 0.75,
+            query_embedding=await query_task, cached=cached,
+            deadline=time.monotonic() + RERANK_BUDGET,
+        )
+        return source, optimized_query, mesh_query, [a for a, _ in ranked]
+    finally:
+        for task in (query_task, remote_task, local_task):
+            if task:
+                task.cancel()
+
+@app.post("/search/semantic")
+async def search_semantic(body: SemanticQuery, user: dict = Depends(get_current_user)):
+    mode = body.source if body.source in ("hybrid", "remote", "local") else "hybrid"
+    try:
+        # Identical concurrent searches (any user) share one retrieval + rerank
+        key = flight_key("semantic", preprocess_query(body.query), body.top_k, body.threshold, mode)
+        source, optimized_query, mesh_query, articles_only = await single_flight.do(
+            key, lambda: semantic_search(body, mode)
+        )
+        if articles_only is None:
+            return {"source": source, "results": [], "message": "No articles found"}
 
         # 4) Persist to Mongo and return only plain articles
         doc = {
             "query": body.query,
             "optimized_query": optimized_query,
             "mesh_query": mesh_query,
+            "source": source,
             "results": articles_only,
             "articles": articles_only,
             "timestamp": datetime.datetime.now(timezone.utc),
             "user_id": user["user_id"],
             "email": user.get("email"),
         }
-        semantic_collection.insert_one(doc)
-        return {"source": "api", "results": articles_only}
+        await semantic_log.add(doc)
+        return {"source": source, "results": articles_only}
     except HTTPException:
         raise
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "query_rewrite": {
+            "memory": rewrite_cache.stats(),
+            "mongo": rewrite_mongo_stats.stats(),
+        },
+        "single_flight": dict(single_flight.stats),
+        "semantic_log": semantic_log.stats(),
+        "response_cache": {
+            "enabled": RESPONSE_CACHE,
+            "threshold": RESPONSE_CACHE_THRESHOLD,
+            "modes": {mode: cache.stats() for mode, cache in response_caches.items()},
+        },
+    }
+
+# Caches and buffers are read at scrape time through their existing stats()
+REGISTRY.watch("cache", rewrite_cache.stats, cache="query_rewrite")
+REGISTRY.watch("cache", rewrite_mongo_stats.stats, cache="query_rewrite_mongo")
+REGISTRY.watch("cache", article_store.lookups.stats, cache="articles")
+REGISTRY.watch("cache", lambda: _embedding_store.lookups.stats() if _embedding_store else {}, cache="embeddings")
+for _mode, _cache in response_caches.items():
+    REGISTRY.watch("cache", _cache.stats, cache=f"response_{_mode.lower().replace(' ', '_')}")
+REGISTRY.watch("single_flight", lambda: single_flight.stats)
+REGISTRY.watch("write_behind", semantic_log.stats, buffer="semantic_log")
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: stage and upstream latency histograms, errors, in-flight gauges, caches."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # -----------------------------
 # 7. Profile Endpoint
 # -----------------------------
 @app.get("/profile")
-def get_profile(user: dict = Depends(get_current_user)):
+async def get_profile(user: dict = Depends(get_current_user)):
     user_id = user['user_id']
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users_collection.find_one({"_id": ObjectId(user_id)}, {"name": 1, "email": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return {
@@ -435,7 +1110,7 @@ def get_profile(user: dict = Depends(get_current_user)):
 # ✅ Root
 # -----------------------------
 @app.get("/")
-def root():
+async def root():
     return {"message": "Biomedical Chatbot API is running 🚀"}
 
 # -----------------------------
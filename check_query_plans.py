@@ -0,0 +1,110 @@
+# -----------------------------
+# check_query_plans.py (fails when a service query would scan a whole collection)
+# -----------------------------
+"""Explain every hot Mongo query of both services and fail on COLLSCAN.
+
+    MONGO_URI=mongodb://... python check_query_plans.py [--db pubmed_db] [--no-create]
+
+Creates the indexes declared in mongo_indexes.py (unless --no-create), runs
+`explain()` on the same filters, projections and sorts the services issue, and
+exits 1 if any winning plan contains a COLLSCAN stage. tests/test_query_plans.py
+runs the same checks in CI against a scratch mongod (MONGO_TEST_URI); this script is
+for spot checks against a real deployment.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient
+
+from mongo_indexes import INDEXES, ensure_indexes
+
+NOW = datetime.now(timezone.utc)
+
+# (description, collection, filter, projection, sort) mirroring the services' queries
+QUERIES = [
+    ("chatbot get_from_mongo", "chatbot_articles",
+     {"user_id": "u", "mode": "Concept", "user_query": "q"}, {"_id": 0, "llm_response": 1}, [("timestamp", -1)]),
+    ("chatbot single-flight peek", "chatbot_articles",
+     {"mode": "Concept", "normalized_query": "q", "timestamp": {"$gte": NOW}},
+     {"_id": 0, "llm_response": 1, "user_id": 1}, [("timestamp", -1)]),
+    ("advanced /history page", "search_history",
+     {"$and": [{"user_id": "u"}, {"$or": [{"timestamp": {"$lt": NOW}}, {"timestamp": NOW, "_id": {"$lt": ObjectId()}}]}]},
+     None, [("timestamp", -1), ("_id", -1)]),
+    ("advanced /history/summary $match", "search_history",
+     {"user_id": "u"}, {"_id": 0, "mode": 1, "search_type": 1, "results_count": 1}, None),
+    ("advanced /cache/advanced history page", "search_history",
+     {"user_id": "u", "search_type": {"$exists": False}},
+     {"query": 1, "filters": 1, "retmax": 1, "cache_key": 1, "timestamp": 1}, [("timestamp", -1), ("_id", -1)]),
+    ("advanced cache lookup", "articles", {"cache_key": "k"}, {"_id": 0, "results": 1, "cached_at": 1}, None),
+    ("advanced /cache/advanced items", "articles",
+     {"$or": [{"cache_key": {"$in": ["k"]}}, {"query_hash": {"$in": ["h"]}, "cache_key": {"$exists": False}}]},
+     None, None),
+    ("article store get_many", "pubmed_articles", {"pmid": {"$in": ["1", "2"]}}, {"_id": 0, "fetched_at": 0}, None),
+]
+
+
+def plan_stages(plan):
+    """All stage names in a (possibly nested) query plan."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+async def create_indexes(db):
+    await ensure_indexes(db, list(INDEXES))
+    await db["pubmed_articles"].create_index("pmid", unique=True)
+
+
+async def winning_stages(db, collection, filter_, projection, sort):
+    cursor = db[collection].find(filter_, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    explain = await cursor.explain()
+    return list(plan_stages(explain["queryPlanner"]["winningPlan"]))
+
+
+async def check(db):
+    failures = 0
+    for description, collection, filter_, projection, sort in QUERIES:
+        stages = await winning_stages(db, collection, filter_, projection, sort)
+        ok = "COLLSCAN" not in stages
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {description:<36} {collection:<18} {' > '.join(stages)}")
+    return failures
+
+
+async def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI"))
+    parser.add_argument("--db", default="pubmed_db")
+    parser.add_argument("--no-create", action="store_true", help="only check, don't create missing indexes")
+    args = parser.parse_args()
+    if not args.uri:
+        sys.exit("Set MONGO_URI or pass --uri")
+
+    client = AsyncMongoClient(args.uri)
+    try:
+        db = client[args.db]
+        if not args.no_create:
+            await create_indexes(db)
+        failures = await check(db)
+    finally:
+        await client.close()
+    if failures:
+        print(f"\n{failures} quer{'y' if failures == 1 else 'ies'} would scan a whole collection")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -12,6 +12,7 @@ const COLORS = ["#3b82f6", "#10b981", "#f59e0b", "#8b5cf6"];
 const Dashboard = () => {
   const [activity, setActivity] = useState<any[]>([]);
   const [profile, setProfile] = useState<any>(null);
+  const [summary, setSummary] = useState<any>(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -24,7 +25,13 @@ const Dashboard = () => {
         const profileData = await profileRes.json();
         setProfile(profileData);
 
-        // Fetch chat history
+        // Totals over the whole history; /history itself only returns the latest page
+        const summaryRes = await fetch("http://127.0.0.1:8000/history/summary", {
+          headers: getAuthHeader(),
+        });
+        setSummary(await summaryRes.json());
+
+        // Latest page of history (newest first) for the chart and the timeline
         const histRes = await fetch("http://127.0.0.1:8000/history", {
           headers: getAuthHeader(),
         });
@@ -33,7 +40,7 @@ const Dashboard = () => {
 
         const formatted = hist.map((item: any) => ({
           query: item.query,
-          mode: item.mode,
+          mode: item.mode || item.search_type || "advanced",
           score: item.results_count || 0,
           date: item.timestamp ? new Date(item.timestamp).toLocaleDateString() : "",
           fullDate: item.timestamp ? new Date(item.timestamp).toLocaleString() : "",
@@ -51,18 +58,15 @@ const Dashboard = () => {
 
   if (loading) return <p className="p-6">Loading dashboard...</p>;
 
-  const totalQueries = activity.length;
-  const avgScore = totalQueries > 0
-    ? (activity.reduce((a, b) => a + (b.score || 0), 0) / totalQueries).toFixed(2)
-    : 0;
+  const totalQueries = summary?.total_queries ?? 0;
+  const avgScore = totalQueries > 0 ? Number(summary.avg_results).toFixed(2) : 0;
   const streak = 7; // mock
   const achievements = 3; // mock
 
-  // Mode distribution
-  const modeCounts: Record<string, number> = {};
-  activity.forEach((a) => {
-    modeCounts[a.mode] = (modeCounts[a.mode] || 0) + 1;
-  });
+  // Mode distribution over the whole history
+  const modeCounts: Record<string, number> = summary?.modes ?? {};
+  // Oldest to newest, left to right
+  const chartData = [...activity].reverse();
 
   const donutData = Object.entries(modeCounts).map(([name, value]) => ({
     name,
@@ -118,7 +122,7 @@ const Dashboard = () => {
         <div className="bg-white rounded-xl shadow p-6">
           <h3 className="text-lg font-semibold mb-4">Scores Over Time</h3>
           <ResponsiveContainer width="100%" height={280}>
-            <AreaChart data={activity}>
+            <AreaChart data={chartData}>
               <defs>
                 <linearGradient id="colorScore" x1="0" y1="0" x2="0" y2="1">
                   <stop offset="5%" stopColor="#3b82f6" stopOpacity={0.8} />
@@ -12,27 +12,33 @@ const History: React.FC = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [openIndex, setOpenIndex] = useState<number | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+
+  // Pages come back newest first; next_cursor fetches the following page
+  const load = async (cursor?: string) => {
+    setLoading(true);
+    setError('');
+    try {
+      const token = localStorage.getItem('jwt_token');
+      const url = cursor
+        ? `http://127.0.0.1:8000/cache/advanced?cursor=${encodeURIComponent(cursor)}`
+        : 'http://127.0.0.1:8000/cache/advanced';
+      const res = await fetch(url, {
+        headers: token ? { 'Authorization': `Bearer ${token}` } : {}
+      });
+      if (!res.ok) throw new Error(`Failed to load (${res.status})`);
+      const data = await res.json();
+      const raw: CachedItem[] = Array.isArray(data.items) ? data.items : [];
+      setItems(prev => (cursor ? [...prev, ...raw] : raw));
+      setNextCursor(data.next_cursor || null);
+    } catch (e: any) {
+      setError(e?.message || 'Failed to load');
+    } finally {
+      setLoading(false);
+    }
+  };
 
   useEffect(() => {
-    const load = async () => {
-      setLoading(true);
-      setError('');
-      try {
-        const token = localStorage.getItem('jwt_token');
-        const res = await fetch('http://127.0.0.1:8000/cache/advanced', {
-          headers: token ? { 'Authorization': `Bearer ${token}` } : {}
-        });
-        if (!res.ok) throw new Error(`Failed to load (${res.status})`);
-        const data = await res.json();
-        const raw: CachedItem[] = Array.isArray(data.items) ? data.items : [];
-        const sorted = raw.sort((a: any, b: any) => new Date(b.timestamp || 0).getTime() - new Date(a.timestamp || 0).getTime());
-        setItems(sorted);
-      } catch (e: any) {
-        setError(e?.message || 'Failed to load');
-      } finally {
-        setLoading(false);
-      }
-    };
     load();
   }, []);
 
@@ -76,6 +82,14 @@ const History: React.FC = () => {
         {items.length === 0 && !loading && (
           <p className="text-slate-600">No cached searches found.</p>
         )}
+        {nextCursor && !loading && (
+          <button
+            onClick={() => load(nextCursor)}
+            className="mt-2 px-4 py-2 text-sm text-slate-700 border border-slate-200 rounded hover:bg-slate-50"
+          >
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
@@ -0,0 +1,198 @@
+# -----------------------------
+# embedding_store.py (per-PMID PubMedBERT embedding cache backed by ChromaDB, mirrored to Mongo)
+# -----------------------------
+import os
+
+import numpy as np
+from pymongo import ReplaceOne
+
+from metrics import HitCounter
+
+FIELDS = ("title", "abstract")
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_store")
+COLLECTION_NAME = "pubmed_articles"
+# Mongo copy of the vectors, in pubmed_db next to the article store, for services without the Chroma directory
+VECTOR_COLLECTION = "pubmed_vectors"
+# Vectors are stored unit-length, so nearest() ranks by cosine whatever the collection's HNSW space
+HNSW_SPACE = "cosine"
+
+
+def unit(vecs):
+    """L2-normalise a vector, or each row of a matrix; zero vectors stay zero."""
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    return np.divide(vecs, norms, out=np.zeros_like(vecs), where=norms > 0)
+
+
+class EmbeddingStore:
+    """Title and abstract vectors keyed by PMID, stored as `<pmid>:title` / `<pmid>:abstract`.
+
+    Every vector carries the model name and pooling version in its metadata; vectors
+    written under a different model or pooling are treated as misses and overwritten.
+    Vectors are L2-normalised on write (`normalized` in the metadata), so the ANN search
+    in `nearest` orders by cosine like the rerankers do; vectors written before that are
+    misses too and get re-embedded on their next use. With a `mirror` (a MongoVectorStore),
+    every write is copied there too.
+    """
+
+    def __init__(self, collection, model_name, pooling_version, mirror=None):
+        self.collection = collection
+        self.model_name = model_name
+        self.pooling_version = pooling_version
+        self.mirror = mirror
+        self.lookups = HitCounter()
+
+    @staticmethod
+    def _id(pmid, field):
+        return f"{pmid}:{field}"
+
+    def _is_current(self, meta):
+        return (
+            bool(meta)
+            and meta.get("model") == self.model_name
+            and meta.get("pooling") == self.pooling_version
+            and meta.get("normalized") is True
+        )
+
+    def get_many(self, pmids):
+        """Return {pmid: (title_vec, abstract_vec)} for every PMID with both vectors current."""
+        pmids = list(dict.fromkeys(p for p in pmids if p))
+        if not pmids:
+            return {}
+        ids = [self._id(p, f) for p in pmids for f in FIELDS]
+        found = self.collection.get(ids=ids, include=["embeddings", "metadatas"])
+
+        vectors = {}
+        for id_, emb, meta in zip(found["ids"], found["embeddings"], found["metadatas"]):
+            if self._is_current(meta):
+                vectors[id_] = np.asarray(emb, dtype=np.float32)
+
+        hits = {}
+        for p in pmids:
+            title_id, abstract_id = (self._id(p, f) for f in FIELDS)
+            if title_id in vectors and abstract_id in vectors:
+                hits[p] = (vectors[title_id], vectors[abstract_id])
+        self.lookups.record(hits=len(hits), misses=len(pmids) - len(hits))
+        return hits
+
+    def put_many(self, items):
+        """Upsert {pmid: (title_vec, abstract_vec)} in a single bulk write."""
+        ids, embeddings, metadatas = [], [], []
+        for pmid, pair in items.items():
+            if not pmid:
+                continue
+            for field, vec in zip(FIELDS, pair):
+                ids.append(self._id(pmid, field))
+                embeddings.append(unit(vec).tolist())
+                metadatas.append({
+                    "pmid": pmid,
+                    "field": field,
+                    "model": self.model_name,
+                    "pooling": self.pooling_version,
+                    "normalized": True,
+                })
+        if ids:
+            self.collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas)
+        if self.mirror is not None:
+            try:
+                self.mirror.put_many(items)
+            except Exception as e:
+                # Chroma stays the source of truth; the mirror catches up on the next write of this PMID
+                print(f"⚠️ Vector mirror write failed: {e}")
+        return len(ids) // len(FIELDS)
+
+    def nearest(self, query_embedding, n_results=40):
+        """PMIDs whose title or abstract vector is nearest the query by cosine (HNSW ANN), closest first."""
+        count = self.collection.count()
+        if not count or not np.any(query_embedding):
+            return []
+        found = self.collection.query(
+            # Unit query against unit vectors: L2 and cosine distance give the same order
+            query_embeddings=[unit(query_embedding).tolist()],
+            # Each PMID has two vectors, so over-fetch before de-duplicating
+            n_results=min(2 * n_results, count),
+            where={"$and": [
+                {"model": self.model_name},
+                {"pooling": self.pooling_version},
+                {"normalized": True},
+            ]},
+            include=["metadatas"],
+        )
+        pmids = [meta["pmid"] for meta in found["metadatas"][0]]
+        return list(dict.fromkeys(pmids))[:n_results]
+
+
+class MongoVectorStore:
+    """The same title/abstract vectors as EmbeddingStore, one Mongo document per PMID.
+
+    Lives next to the article store so a service that can't see the Chroma directory
+    still reads every vector the chatbot and ingest_baseline.py wrote. Vectors are
+    unit-length float32 bytes under the model and pooling they were written with; others
+    are misses. Works on a sync (pymongo MongoClient) collection, for the inference
+    threads. There is no ANN index here, so `nearest` finds nothing.
+    """
+
+    def __init__(self, collection, model_name, pooling_version):
+        self.collection = collection
+        self.model_name = model_name
+        self.pooling_version = pooling_version
+        self.lookups = HitCounter()
+
+    def get_many(self, pmids):
+        """Return {pmid: (title_vec, abstract_vec)} for every PMID with both vectors current."""
+        pmids = list(dict.fromkeys(p for p in pmids if p))
+        if not pmids:
+            return {}
+        found = self.collection.find(
+            {"_id": {"$in": pmids}, "model": self.model_name, "pooling": self.pooling_version},
+            {field: 1 for field in FIELDS},
+        )
+        hits = {
+            doc["_id"]: tuple(np.frombuffer(doc[field], dtype=np.float32) for field in FIELDS)
+            for doc in found
+        }
+        self.lookups.record(hits=len(hits), misses=len(pmids) - len(hits))
+        return hits
+
+    def put_many(self, items):
+        """Upsert {pmid: (title_vec, abstract_vec)} in a single bulk write."""
+        ops = [
+            ReplaceOne({"_id": pmid}, {
+                "model": self.model_name,
+                "pooling": self.pooling_version,
+                **{field: unit(vec).tobytes() for field, vec in zip(FIELDS, pair)},
+            }, upsert=True)
+            for pmid, pair in items.items() if pmid
+        ]
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    def nearest(self, query_embedding, n_results=40):
+        return []
+
+
+def open_mongo_store(mongo_uri, model_name, pooling_version):
+    """MongoVectorStore over pubmed_db.pubmed_vectors; the sync client is only created here."""
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_uri)
+    return MongoVectorStore(client["pubmed_db"][VECTOR_COLLECTION], model_name, pooling_version)
+
+
+def open_store(model_name, pooling_version, path=CHROMA_PATH, mirror=None):
+    """EmbeddingStore over the shared pubmed_articles collection; chromadb is only imported here.
+
+    New collections are created with cosine space. An existing collection keeps its space
+    (Chroma can't change it), except that an empty one is recreated with cosine.
+    """
+    import chromadb
+
+    client = chromadb.PersistentClient(path=path)
+    configuration = {"hnsw": {"space": HNSW_SPACE}}
+    collection = client.get_or_create_collection(COLLECTION_NAME, configuration=configuration)
+    space = (collection.configuration.get("hnsw") or {}).get("space")
+    if space != HNSW_SPACE and collection.count() == 0:
+        client.delete_collection(COLLECTION_NAME)
+        collection = client.create_collection(COLLECTION_NAME, configuration=configuration)
+    return EmbeddingStore(collection, model_name, pooling_version, mirror=mirror)
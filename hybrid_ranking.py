@@ -0,0 +1,82 @@
+# -----------------------------
+# hybrid_ranking.py (BM25 over candidate titles/abstracts, fused with dense PubMedBERT scores)
+# -----------------------------
+import re
+from collections import Counter
+
+import numpy as np
+
+from cache_utils import LRUCache
+from keyword_ranking import STOPWORDS
+
+BM25_K1, BM25_B = 1.2, 0.75
+TITLE_BOOST = 2.0  # a title occurrence counts as two abstract occurrences (BM25F-style)
+FUSION_METHODS = ("rrf", "weighted", "dense")
+
+_token_re = re.compile(r"\w+")
+
+
+def terms(text):
+    return [t for t in _token_re.findall((text or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class TermStats:
+    """Per-article (term frequencies, length), cached by PMID so each article is tokenized once."""
+
+    def __init__(self, maxsize=20000):
+        self.cache = LRUCache(maxsize=maxsize)
+
+    def get(self, article):
+        pmid = article.get("pmid")
+        stats = self.cache.get(pmid) if pmid else None
+        if stats is None:
+            tf = Counter(terms(article.get("abstract")))
+            for t in terms(article.get("title")):
+                tf[t] += TITLE_BOOST
+            stats = (dict(tf), sum(tf.values()))
+            if pmid:
+                self.cache.set(pmid, stats)
+        return stats
+
+
+def bm25_scores(query_terms, stats):
+    """BM25 of every candidate against the query, with IDF taken over the candidate set.
+
+    Returns (scores, coverage): coverage is the share of distinct query terms each candidate contains.
+    """
+    n = len(stats)
+    query_terms = list(dict.fromkeys(query_terms))
+    if not n or not query_terms:
+        return np.zeros(n), np.zeros(n)
+    tf = np.array([[doc.get(t, 0.0) for t in query_terms] for doc, _ in stats], dtype=np.float64)
+    lengths = np.array([length for _, length in stats], dtype=np.float64)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1e-9))
+    scores = (idf * tf * (BM25_K1 + 1) / (tf + norm[:, None])).sum(axis=1)
+    coverage = np.count_nonzero(tf, axis=1) / len(query_terms)
+    return scores, coverage
+
+
+def ranks(scores):
+    """0-based rank of each score, best first."""
+    order = np.argsort(-scores, kind="stable")
+    result = np.empty(len(scores), dtype=np.int64)
+    result[order] = np.arange(len(scores))
+    return result
+
+
+def minmax(scores):
+    spread = scores.max() - scores.min() if len(scores) else 0
+    return (scores - scores.min()) / spread if spread > 0 else np.zeros_like(scores)
+
+
+def fuse(dense, sparse, method="rrf", alpha=0.5, rrf_k=60):
+    """Combine dense and sparse scores: reciprocal-rank fusion, min-max weighted sum, or dense only."""
+    if method == "dense" or not sparse.any():
+        return dense
+    if method == "rrf":
+        return 1 / (rrf_k + 1 + ranks(dense)) + 1 / (rrf_k + 1 + ranks(sparse))
+    if method == "weighted":
+        return alpha * minmax(dense) + (1 - alpha) * minmax(sparse)
+    raise ValueError(f"Unknown fusion method {method!r}, expected one of {FUSION_METHODS}")
@@ -0,0 +1,276 @@
+# -----------------------------
+# ingest_baseline.py (offline bulk ingestion of PubMed baseline/updatefile dumps)
+# -----------------------------
+"""Pre-embed local PubMed baseline/updatefile dumps into chroma_store and the article store.
+
+    python ingest_baseline.py pubmed25n0001.xml.gz pubmed25n0002.xml.gz ... \\
+        [--parse-workers 2] [--tokenize-workers 2] [--infer-workers 1] [--batch 256]
+
+Pipeline (every stage is its own process pool, connected by bounded queues):
+
+    files -> parse (gzip + XMLPullParser, same extraction as efetch)
+          -> tokenize (PubMedBERT tokenizer)
+          -> infer (EMBEDDING_BACKEND, length-bucketed batches)
+          -> writer (this process: Chroma vectors + Mongo article documents and vector mirror)
+
+Progress is checkpointed per batch to --checkpoint, so an interrupted run resumes
+where it stopped: finished files are skipped and already written batches of a
+partly ingested file are parsed but not re-embedded. Files are tracked by absolute
+path, and a checkpoint only resumes with the --batch it was written with (batch
+numbers mean nothing under another batch size).
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+import types
+
+import numpy as np
+from dotenv import load_dotenv
+
+import pubmed_embeddings
+from embedding_store import CHROMA_PATH, open_mongo_store, open_store
+from pubmed_eutils import iter_pubmed_articles
+
+READ_CHUNK = 1 << 20
+STOP = None
+
+
+# -----------------------------
+# Checkpoint
+# -----------------------------
+class Checkpoint:
+    """Written batch numbers per file (by absolute path), saved atomically after every write.
+
+    Raises ValueError if an existing checkpoint was written with another batch size.
+    """
+
+    def __init__(self, path, batch_size):
+        self.path = path
+        self.batch_size = batch_size
+        self.files = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            self.files = saved.get("files", {})
+            if self.files and saved.get("batch_size") != batch_size:
+                written_with = saved.get("batch_size") or "an unrecorded batch size"
+                raise ValueError(f"{path} was written with --batch {written_with}, not {batch_size}; "
+                                 f"rerun with that --batch or delete the checkpoint to start over")
+
+    def entry(self, name):
+        return self.files.setdefault(name, {"batches": [], "total": None, "articles": 0})
+
+    def done_batches(self, name):
+        return set(self.files.get(name, {}).get("batches", []))
+
+    def is_complete(self, name):
+        entry = self.files.get(name)
+        return bool(entry) and entry["total"] is not None and len(entry["batches"]) >= entry["total"]
+
+    def mark_batch(self, name, seq, articles):
+        entry = self.entry(name)
+        if seq not in entry["batches"]:
+            entry["batches"].append(seq)
+            entry["articles"] += articles
+
+    def mark_total(self, name, total):
+        self.entry(name)["total"] = total
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"batch_size": self.batch_size, "files": self.files}, f)
+        os.replace(tmp, self.path)
+
+
+# -----------------------------
+# Pipeline stages (run in child processes)
+# -----------------------------
+def iter_file_chunks(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        yield from iter(lambda: f.read(READ_CHUNK), b"")
+
+
+def parse_worker(file_q, out_q, batch_size, skip):
+    while (path := file_q.get()) is not STOP:
+        name = os.path.abspath(path)
+        done = skip.get(name, set())
+        seq, batch = 0, []
+        for article in iter_pubmed_articles(iter_file_chunks(path)):
+            if not article.get("pmid"):
+                continue
+            batch.append(article)
+            if len(batch) == batch_size:
+                if seq not in done:
+                    out_q.put(("batch", name, seq, batch))
+                seq, batch = seq + 1, []
+        if batch:
+            if seq not in done:
+                out_q.put(("batch", name, seq, batch))
+            seq += 1
+        out_q.put(("eof", name, seq, None))
+
+
+def tokenize_worker(in_q, out_q, model_name):
+    from transformers import AutoTokenizer
+
+    # pubmed_embeddings.tokenize only needs the tokenizer, not the model weights
+    tokenizer_only = types.SimpleNamespace(tokenizer=AutoTokenizer.from_pretrained(model_name))
+    while (msg := in_q.get()) is not STOP:
+        kind, name, seq, articles = msg
+        if kind == "batch":
+            texts = [a.get("title") or "" for a in articles] + [a.get("abstract") or "" for a in articles]
+            indices = [i for i, t in enumerate(texts) if t]
+            features = pubmed_embeddings.tokenize([texts[i] for i in indices], backend=tokenizer_only)
+            msg = (kind, name, seq, (articles, indices, features))
+        out_q.put(msg)
+
+
+def infer_worker(in_q, out_q, backend_name, model_name, batch_size):
+    backend = pubmed_embeddings.load_backend(backend_name, model_name)
+    while (msg := in_q.get()) is not STOP:
+        kind, name, seq, payload = msg
+        if kind == "batch":
+            articles, indices, features = payload
+            m = len(articles)
+            # Same layout as embed_texts: titles then abstracts, zero rows for empty texts
+            embeddings = np.zeros((2 * m, pubmed_embeddings.EMBEDDING_DIM), dtype=np.float32)
+            if indices:
+                embeddings[indices] = pubmed_embeddings.embed_features(features, batch_size=batch_size, backend=backend)
+            msg = (kind, name, seq, (articles, embeddings[:m], embeddings[m:]))
+        out_q.put(msg)
+
+
+def start_stage(ctx, target, count, args):
+    procs = [ctx.Process(target=target, args=args, daemon=True) for _ in range(count)]
+    for p in procs:
+        p.start()
+    return procs
+
+
+def stop_after(procs, next_q, next_count):
+    """Once every process of a stage has exited, tell each process of the next stage to stop."""
+    for p in procs:
+        p.join()
+    for _ in range(next_count):
+        next_q.put(STOP)
+
+
+# -----------------------------
+# Writer (main process)
+# -----------------------------
+def open_article_store(mongo_uri):
+    from pymongo import AsyncMongoClient
+    from article_store import ArticleStore
+
+    client = AsyncMongoClient(mongo_uri)
+    return client, ArticleStore(client["pubmed_db"]["pubmed_articles"])
+
+
+async def write_results(out_q, checkpoint, embedding_store, article_store, report_every):
+    started = last_report = time.perf_counter()
+    written, announced = 0, set()
+    while (msg := await asyncio.to_thread(out_q.get)) is not STOP:
+        kind, name, seq, payload = msg
+        if kind == "eof":
+            checkpoint.mark_total(name, seq)
+        else:
+            articles, titles, abstracts = payload
+            embedding_store.put_many({a["pmid"]: (titles[i], abstracts[i]) for i, a in enumerate(articles)})
+            if article_store is not None:
+                await article_store.put_many(articles)
+            checkpoint.mark_batch(name, seq, len(articles))
+            written += len(articles)
+        checkpoint.save()
+        if name not in announced and checkpoint.is_complete(name):
+            announced.add(name)
+            print(f"✔ {os.path.basename(name)}: {checkpoint.files[name]['articles']} articles")
+
+        now = time.perf_counter()
+        if now - last_report >= report_every:
+            print(f"{written} articles in {now - started:.0f}s ({written / (now - started):.1f} articles/s)")
+            last_report = now
+    return written, time.perf_counter() - started
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="PubMed baseline/updatefile .xml.gz (or .xml) dumps")
+    parser.add_argument("--checkpoint", default="./ingest_checkpoint.json")
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"), help="article store and vector mirror; skipped if unset")
+    parser.add_argument("--model", default=pubmed_embeddings.MODEL_NAME)
+    parser.add_argument("--backend", default=pubmed_embeddings.EMBEDDING_BACKEND, choices=pubmed_embeddings.BACKENDS)
+    parser.add_argument("--batch", type=int, default=256, help="articles per pipeline batch")
+    parser.add_argument("--embed-batch-size", type=int, default=pubmed_embeddings.EMBED_BATCH_SIZE)
+    parser.add_argument("--parse-workers", type=int, default=1)
+    parser.add_argument("--tokenize-workers", type=int, default=1)
+    parser.add_argument("--infer-workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads per inference worker")
+    parser.add_argument("--queue-size", type=int, default=8, help="batches buffered between stages")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between throughput lines")
+    args = parser.parse_args()
+
+    try:
+        checkpoint = Checkpoint(args.checkpoint, args.batch)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    paths = list(dict.fromkeys(os.path.abspath(f) for f in args.files))
+    files = [f for f in paths if not checkpoint.is_complete(f)]
+    for f in set(paths) - set(files):
+        print(f"Skipping {f} (already ingested)")
+    if not files:
+        return
+    if args.threads:
+        # Read by pubmed_embeddings on import in the spawned inference workers
+        os.environ["TORCH_NUM_THREADS"] = str(args.threads)
+
+    mirror = open_mongo_store(args.mongo_uri, args.model, pubmed_embeddings.POOLING_VERSION) if args.mongo_uri else None
+    embedding_store = open_store(args.model, pubmed_embeddings.POOLING_VERSION, path=args.chroma_path, mirror=mirror)
+    mongo_client, article_store = open_article_store(args.mongo_uri) if args.mongo_uri else (None, None)
+
+    # spawn: torch and ONNX Runtime thread pools do not survive fork
+    ctx = mp.get_context("spawn")
+    file_q = ctx.Queue()
+    parsed_q, tokenized_q, embedded_q = (ctx.Queue(maxsize=args.queue_size) for _ in range(3))
+    for f in files:
+        file_q.put(f)
+    for _ in range(args.parse_workers):
+        file_q.put(STOP)
+
+    skip = {f: checkpoint.done_batches(f) for f in files}
+    parsers = start_stage(ctx, parse_worker, args.parse_workers, (file_q, parsed_q, args.batch, skip))
+    tokenizers = start_stage(ctx, tokenize_worker, args.tokenize_workers, (parsed_q, tokenized_q, args.model))
+    inferers = start_stage(ctx, infer_worker, args.infer_workers,
+                           (tokenized_q, embedded_q, args.backend, args.model, args.embed_batch_size))
+    for procs, next_q, next_count in ((parsers, parsed_q, args.tokenize_workers),
+                                      (tokenizers, tokenized_q, args.infer_workers),
+                                      (inferers, embedded_q, 1)):
+        threading.Thread(target=stop_after, args=(procs, next_q, next_count), daemon=True).start()
+
+    async def run():
+        try:
+            if article_store is not None:
+                await article_store.ensure_indexes()
+            return await write_results(embedded_q, checkpoint, embedding_store, article_store, args.report_every)
+        finally:
+            if mongo_client is not None:
+                await mongo_client.close()
+
+    written, elapsed = asyncio.run(run())
+    print(f"\nIngested {written} articles from {len(files)} file(s) in {elapsed:.1f}s "
+          f"({written / max(elapsed, 1e-9):.1f} articles/s)")
+    failed = [p.exitcode for p in parsers + tokenizers + inferers if p.exitcode]
+    if failed:
+        raise SystemExit(f"{len(failed)} worker process(es) failed; rerun to resume from {args.checkpoint}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# -----------------------------
+# keyword_ranking.py (query-term highlighting and term-overlap scoring for search results)
+# -----------------------------
+import re
+
+# Boolean operators and filler words users type into PubMed queries; never highlighted
+STOPWORDS = frozenset({"and", "or", "not", "the", "of", "in", "on", "for", "with", "a", "an", "to", "by"})
+TITLE_WEIGHT, ABSTRACT_WEIGHT = 2.0, 1.0
+
+
+class KeywordMatcher:
+    """Compiled once per request: an escaped alternation of the query phrase and its terms.
+
+    The user's text is always matched literally, never interpreted as a regex. Matches
+    are whole words (an optional plural `s` allowed), so "care" does not match inside
+    "carers", and longer alternatives come first, so the full phrase is highlighted as
+    one span wherever it occurs. `highlight` marks every match the way the API always
+    has (`term**`) and collects which query terms the field contains.
+    """
+
+    def __init__(self, query: str):
+        self.phrase = " ".join(query.lower().split())
+        self.terms = list(dict.fromkeys(
+            t for t in re.findall(r"\w+", self.phrase) if len(t) > 1 and t not in STOPWORDS
+        ))
+        alternatives = set(self.terms)
+        if len(self.terms) > 1:
+            alternatives.add(self.phrase)
+        self._known = alternatives
+        self.pattern = None
+        if alternatives:
+            alternation = "|".join(re.escape(a) for a in sorted(alternatives, key=len, reverse=True))
+            # Leading with the first-character class (before the boundary check) lets the
+            # regex engine scan for candidate positions in C instead of testing every word
+            first = re.escape("".join(sorted({a[0] for a in alternatives})))
+            self.pattern = re.compile(rf"(?=[{first}])(?<!\w)(?:{alternation})s?(?!\w)", re.IGNORECASE)
+
+    def highlight(self, text: str):
+        """Return (text with `match**` marks, set of query terms found)."""
+        if self.pattern is None or not text:
+            return text, set()
+        if len(self.terms) == 1:
+            # Any match is the one term: no need for a Python callback per match
+            marked, n = self.pattern.subn(r"\g<0>**", text)
+            return marked, set(self.terms) if n else set()
+        found = set()
+
+        def mark(match):
+            hit = match.group(0).lower()
+            if hit not in self._known:
+                hit = hit[:-1]  # plural
+            found.update(self.terms if hit == self.phrase else (hit,))
+            return match.group(0) + "**"
+
+        return self.pattern.sub(mark, text), found
+
+    def score(self, title_terms: set, abstract_terms: set):
+        """Share of query terms present, title matches counting double."""
+        if not self.terms:
+            return 0.0
+        return (TITLE_WEIGHT * len(title_terms) + ABSTRACT_WEIGHT * len(abstract_terms)) / (
+            (TITLE_WEIGHT + ABSTRACT_WEIGHT) * len(self.terms)
+        )
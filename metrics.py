@@ -0,0 +1,260 @@
+# -----------------------------
+# metrics.py (in-process Prometheus metrics: stage spans, upstream calls, caches and /metrics, shared by both services)
+# -----------------------------
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; covers a cache hit (ms) up to a slow Gemini rewrite or cold model load
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """One metric family; each label combination holds its own value. Thread-safe."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self):
+        """Yield (name suffix, label pairs, value)."""
+        with self._lock:
+            items = list(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        for key, value in items:
+            yield "", tuple(zip(self.labelnames, key)), value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # [per-bucket counts..., +Inf count, sum]
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[i] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            pairs = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                yield "_bucket", pairs + (("le", _number(float(bound))),), cumulative
+            yield "_sum", pairs, state[-1]
+            yield "_count", pairs, cumulative
+
+
+class Registry:
+    """Metric families plus `watch`ed stats() callables, rendered in the Prometheus text format.
+
+    A watched callable is read at scrape time; every numeric entry of the dict it
+    returns becomes the gauge `<prefix>_<key>`, so existing stats() methods (LRUCache,
+    SemanticCache, SingleFlight, WriteBehindBuffer) are exported without double counting.
+    """
+
+    def __init__(self, prefix="pubmed"):
+        self.prefix = prefix
+        self.metrics = []
+        self.watched = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets))
+
+    def watch(self, name, stats, **labels):
+        self.watched.append((f"{self.prefix}_{name}", stats, tuple(labels.items())))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, pairs, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_labels(pairs)} {_number(value)}")
+
+        families = {}
+        for name, stats, pairs in self.watched:
+            try:
+                values = stats()
+            except Exception as e:
+                print(f"⚠️ Metrics: {name} stats failed: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    families.setdefault(f"{name}_{key}", []).append((pairs, value))
+        for name, samples in families.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{_labels(pairs)} {_number(value)}" for pairs, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+class HitCounter:
+    """Hit/miss counts for a cache that isn't an LRUCache, with the same stats() shape."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits=0, misses=0):
+        self.hits += hits
+        self.misses += misses
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("stage_seconds", "Time spent in one stage of a request", ["stage"])
+UPSTREAM_SECONDS = REGISTRY.histogram("upstream_seconds", "Latency of calls to an upstream service", ["upstream"])
+UPSTREAM_ERRORS = REGISTRY.counter("upstream_errors_total", "Failed calls to an upstream service", ["upstream"])
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge("upstream_in_flight", "Calls to an upstream service in progress", ["upstream"])
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_seconds", "Request latency by route, until the response body is sent", ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "HTTP requests being handled")
+
+
+def span(stage):
+    """Time a block into pubmed_stage_seconds{stage=...}; works in sync and async code alike."""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+@contextmanager
+def upstream_call(upstream):
+    """Time one upstream call, count it as in flight meanwhile, and count it as an error if it raises."""
+    UPSTREAM_IN_FLIGHT.inc(upstream=upstream)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.inc(upstream=upstream)
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, upstream=upstream)
+        UPSTREAM_IN_FLIGHT.dec(upstream=upstream)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: in-flight gauge and latency histogram for every HTTP request.
+
+    Requests are labelled with the matched route template (`/history`, not the raw URL),
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
+            HTTP_IN_FLIGHT.dec()
@@ -0,0 +1,37 @@
+# -----------------------------
+# mongo_indexes.py (indexes for the query patterns of both services, created at startup)
+# -----------------------------
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# collection name -> indexes backing its queries; keep in step with check_query_plans.py
+INDEXES = {
+    "chatbot_articles": [
+        # get_from_mongo: equality on user, mode and question, newest first
+        IndexModel([("user_id", ASCENDING), ("mode", ASCENDING), ("user_query", ASCENDING), ("timestamp", DESCENDING)],
+                   name="user_mode_query_timestamp"),
+        # single-flight peek across users: same mode and normalized question, answered since the lock was taken
+        IndexModel([("mode", ASCENDING), ("normalized_query", ASCENDING), ("timestamp", DESCENDING)],
+                   name="mode_normalized_query_timestamp"),
+    ],
+    "search_history": [
+        # /history (keyset pages on timestamp, _id) and /cache/advanced: one user's searches, newest first
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="user_timestamp_id"),
+    ],
+    "articles": [
+        # Shared with the chatbot's semantic-search documents, which have no cache_key,
+        # so uniqueness only applies to advanced-search cache entries
+        IndexModel([("cache_key", ASCENDING)], name="cache_key_unique", unique=True,
+                   partialFilterExpression={"cache_key": {"$exists": True}}),
+        # /cache/advanced for history written before filter-aware cache keys
+        IndexModel([("query_hash", ASCENDING)], name="query_hash"),
+    ],
+}
+
+
+async def ensure_indexes(db, collections):
+    """Create the declared indexes for `collections`; existing identical indexes are a no-op."""
+    for name in collections:
+        try:
+            await db[name].create_indexes(INDEXES[name])
+        except Exception as e:
+            print(f"⚠️ Could not create indexes on {name}: {e}")
@@ -1,19 +1,60 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List, Tuple, Union
 from datetime import datetime, timezone
-import requests, re, hashlib, jwt, os
-from pymongo import MongoClient
-import xml.etree.ElementTree as ET
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio, base64, re, hashlib, json, jwt, os, threading, time
+import numpy as np
+from bson import ObjectId
+from pymongo import AsyncMongoClient
 from dotenv import load_dotenv
+from pubmed_eutils import EutilsClient
+from article_store import ArticleStore
+from single_flight import SingleFlight, flight_key
+from cache_utils import LRUCache
+from mongo_indexes import ensure_indexes
+from write_behind import WriteBehindBuffer
+from keyword_ranking import KeywordMatcher
+from metrics import CONTENT_TYPE, REGISTRY, HitCounter, MetricsMiddleware, span
 
 load_dotenv()
 
 # -----------------------------
 # FastAPI App
 # -----------------------------
-app = FastAPI(title="PubMed Advanced Search API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await article_store.ensure_indexes()
+    except Exception as e:
+        print(f"Could not create article store index: {e}")
+    await ensure_indexes(db, ["search_history", "articles"])
+    try:
+        # Only advanced-search cache documents carry cached_at; the chatbot's docs in this collection never expire
+        await advanced_collection.create_index("cached_at", expireAfterSeconds=ADVANCED_CACHE_TTL)
+    except Exception as e:
+        print(f"Could not create advanced cache TTL index: {e}")
+    try:
+        await single_flight.ensure_indexes()
+    except Exception as e:
+        print(f"Could not create single-flight lock index: {e}")
+    try:
+        await eutils.ensure_indexes()
+    except Exception as e:
+        print(f"Could not create NCBI rate-limit index: {e}")
+    history_writer.start()
+    yield
+    await history_writer.stop()
+    await eutils.aclose()
+    await mongo_client.close()
+    inference_executor.shutdown(wait=False)
+
+app = FastAPI(title="PubMed Advanced Search API", lifespan=lifespan)
 
 # -----------------------------
 # CORS Setup
@@ -25,15 +66,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-route latency and in-flight requests for /metrics
+app.add_middleware(MetricsMiddleware)
 
 # -----------------------------
 # MongoDB Setup
 # -----------------------------
 connection_string = os.getenv("MONGO_URI")
-mongo_client = MongoClient(connection_string)
+mongo_client = AsyncMongoClient(connection_string)
 db = mongo_client["pubmed_db"]
 advanced_collection = db["articles"]
 history_collection = db["search_history"]
+# Search-history inserts are batched off the request path (LOG_BATCH_SIZE / LOG_FLUSH_MS / LOG_QUEUE_SIZE)
+history_writer = WriteBehindBuffer(history_collection)
+article_store = ArticleStore(db["pubmed_articles"])
+
+# Identical concurrent searches share one upstream call; SINGLE_FLIGHT_LOCKS=mongo extends this across workers
+SINGLE_FLIGHT_LOCKS = os.getenv("SINGLE_FLIGHT_LOCKS", "none").lower()
+single_flight = SingleFlight(db["inflight_locks"] if SINGLE_FLIGHT_LOCKS == "mongo" else None)
 
 # -----------------------------
 # JWT Secret (must match Express)
@@ -46,6 +96,10 @@ JWT_ALGORITHM = "HS256"
 # NCBI API Key
 # -----------------------------
 API_KEY = os.getenv("NCBI_API_KEY")
+# The key's rate limit is shared with the chatbot API and every replica through
+# ncbi_rate_slots; NCBI_RATE_LIMITER=local gives this process the full limit instead
+NCBI_RATE_LIMITER = os.getenv("NCBI_RATE_LIMITER", "mongo").lower()
+eutils = EutilsClient(api_key=API_KEY, rate_collection=db["ncbi_rate_slots"] if NCBI_RATE_LIMITER == "mongo" else None)
 
 # -----------------------------
 # Request Schemas
@@ -71,7 +125,7 @@ class SemanticQuery(BaseModel):
 # -----------------------------
 # JWT Decode Dependency
 # -----------------------------
-def get_current_user(authorization: str = Header(...)):
+async def get_current_user(authorization: str = Header(...)):
     print("Authorization header:", authorization)
     try:
         scheme, token = authorization.split()
@@ -100,23 +154,77 @@ def normalize_query(query: str) -> str:
 def hash_query(query: str):
     return hashlib.sha256(normalize_query(query).encode()).hexdigest()
 
-def get_cached_results(query: str):
-    qhash = hash_query(query)
-    cached = advanced_collection.find_one({"query_hash": qhash})
+def cache_key(query: str, filters: Optional[SearchFilters] = None, retmax: Optional[int] = 10):
+    """Canonical key for one advanced search: normalized query + serialized filters + retmax."""
+    filters = (filters or SearchFilters()).model_dump()
+    # OR-joined filter values don't depend on order
+    filters = {k: sorted(v) if isinstance(v, list) else v for k, v in filters.items()}
+    canonical = json.dumps({"query": normalize_query(query), "filters": filters, "retmax": retmax}, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+# Two-tier results cache: a bounded in-process LRU in front of Mongo. Entries older than
+# ADVANCED_CACHE_FRESH are still served but refreshed in the background (stale-while-revalidate);
+# Mongo drops them after ADVANCED_CACHE_TTL via a TTL index on cached_at.
+ADVANCED_CACHE_TTL = int(os.getenv("ADVANCED_CACHE_TTL", 7 * 24 * 3600))
+ADVANCED_CACHE_FRESH = int(os.getenv("ADVANCED_CACHE_FRESH", 24 * 3600))
+results_cache = LRUCache(maxsize=int(os.getenv("ADVANCED_CACHE_SIZE", 512)), ttl=ADVANCED_CACHE_TTL)
+mongo_cache_stats = HitCounter()
+refresh_tasks = set()
+
+def cache_age(cached_at: datetime):
+    if cached_at.tzinfo is None:
+        cached_at = cached_at.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - cached_at).total_seconds()
+
+async def get_cached_entry(key: str):
+    """Return (results, cached_at) from memory, then Mongo; None on a miss."""
+    entry = results_cache.get(key)
+    if entry:
+        return entry
+    with span("cache_lookup"):
+        cached = await advanced_collection.find_one({"cache_key": key}, {"_id": 0, "results": 1, "cached_at": 1})
+    mongo_cache_stats.record(hits=int(bool(cached)), misses=int(not cached))
     if cached:
-        return cached["results"]
+        entry = (cached["results"], cached["cached_at"])
+        # Keep it in memory only for what is left of its Mongo TTL, not a fresh ADVANCED_CACHE_TTL
+        remaining = ADVANCED_CACHE_TTL - cache_age(cached["cached_at"])
+        if remaining > 0:
+            results_cache.set(key, entry, ttl=remaining)
+        return entry
     return None
 
-def save_results_to_cache(query: str, results: list):
-    qhash = hash_query(query)
+async def get_cached_results(key: str):
+    entry = await get_cached_entry(key)
+    return entry[0] if entry else None
+
+async def save_results_to_cache(query: AdvancedQuery, results: list):
+    key = cache_key(query.query, query.filters, query.retmax)
+    now = datetime.now(timezone.utc)
     doc = {
-        "query": query,
-        "normalized_query": normalize_query(query),
-        "query_hash": qhash,
+        "query": query.query,
+        "normalized_query": normalize_query(query.query),
+        "query_hash": hash_query(query.query),
+        "cache_key": key,
+        "filters": query.filters.model_dump() if query.filters else {},
+        "retmax": query.retmax,
         "results": results,
-        "timestamp": datetime.now(timezone.utc),
+        "timestamp": now,
+        "cached_at": now,
     }
-    advanced_collection.update_one({"query_hash": qhash}, {"$set": doc}, upsert=True)
+    with span("cache_write"):
+        await advanced_collection.update_one({"cache_key": key}, {"$set": doc}, upsert=True)
+    results_cache.set(key, (results, now))
+
+def refresh_in_background(query: AdvancedQuery, key: str):
+    async def refresh():
+        try:
+            await single_flight.do(key, lambda: search_and_cache(query))
+        except Exception as e:
+            print(f"Background cache refresh failed: {e}")
+
+    task = asyncio.create_task(refresh())
+    refresh_tasks.add(task)
+    task.add_done_callback(refresh_tasks.discard)
 
 def build_search_term(query: str, filters: Optional[SearchFilters] = None):
     term = query
@@ -160,115 +268,226 @@ def build_search_term(query: str, filters: Optional[SearchFilters] = None):
 
     return term
 
-def pubmed_esearch(search_term: str, retmax: int = 20):
-    url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-    params = {
-        "db": "pubmed",
-        "term": search_term,
-        "retmax": retmax,
-        "retmode": "xml",
-        "api_key": API_KEY,
-    }
-    r = requests.get(url, params=params, timeout=10)
-    root = ET.fromstring(r.content)
-    return [id_elem.text for id_elem in root.findall(".//Id")]
-
-def pubmed_efetch_text(pmids: list, keyword: str = ""):
+async def pubmed_esearch(search_term: str, retmax: int = 20):
+    return await eutils.aesearch(search_term, retmax=retmax)
+
+def format_article(article: dict, matcher: Optional[KeywordMatcher] = None):
+    """Response shape for one article plus its term-overlap score (0 without a matcher)."""
+    pmid = article["pmid"] or "N/A"
+    title = article["title"] or "N/A"
+    abstract = article["abstract"] or "N/A"
+    journal = article["journal"] or "N/A"
+    pub_year = article["year"] or "N/A"
+    authors = ", ".join(article["authors"]) if article["authors"] else "N/A"
+
+    score = 0.0
+    if matcher:
+        title, title_terms = matcher.highlight(title)
+        abstract, abstract_terms = matcher.highlight(abstract)
+        score = matcher.score(title_terms, abstract_terms)
+
+    return {
+        "PMID": pmid,
+        "Title": title,
+        "Journal": journal,
+        "Year": pub_year,
+        "Authors": authors,
+        "Abstract": abstract,
+        "Link": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
+    }, score
+
+async def pubmed_efetch_text(pmids: list, keyword: str = ""):
     if not pmids:
         return []
 
-    ids = ",".join(pmids)
-    url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
-    params = {"db": "pubmed", "id": ids, "retmode": "xml", "api_key": API_KEY}
-
-    r = requests.get(url, params=params, timeout=10)
-    r.encoding = "utf-8"
-    try:
-        root = ET.fromstring(r.text)
-    except ET.ParseError:
-        return []
-
-    results = []
-    for article in root.findall(".//PubmedArticle"):
-        pmid = article.findtext(".//PMID") or "N/A"
-        title = article.findtext(".//ArticleTitle") or "N/A"
-        abstract = article.findtext(".//Abstract/AbstractText") or "N/A"
-        journal = article.findtext(".//Journal/Title") or "N/A"
-        pub_year = article.findtext(".//PubDate/Year") or "N/A"
-
-        authors_list = []
-        for author in article.findall(".//Author"):
-            lastname = author.findtext("LastName")
-            initials = author.findtext("Initials")
-            if lastname and initials:
-                authors_list.append(f"{lastname} {initials}")
-        authors = ", ".join(authors_list) if authors_list else "N/A"
-
-        if keyword:
-            title = re.sub(f"({keyword})", r"\1**", title, flags=re.IGNORECASE)
-            abstract = re.sub(f"({keyword})", r"\1**", abstract, flags=re.IGNORECASE)
-
-        results.append(
-            {
-                "PMID": pmid,
-                "Title": title,
-                "Journal": journal,
-                "Year": pub_year,
-                "Authors": authors,
-                "Abstract": abstract,
-                "Link": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
-            }
-        )
-
-    if keyword:
-        results.sort(key=lambda x: 0 if re.search(keyword, x["Title"], re.IGNORECASE) else 1)
+    # One compiled, escaped matcher per request: highlights and scores each field in a single pass
+    matcher = KeywordMatcher(keyword) if keyword else None
+
+    # Stored PMIDs come from Mongo; only the rest are efetched (streamed, 200 per call)
+    with span("efetch"):
+        articles = await article_store.fetch(pmids, eutils)
+
+    with span("highlight"):
+        scored = [format_article(a, matcher) for a in articles]
+        if matcher:
+            # Stable: equal scores keep PubMed's relevance order
+            scored.sort(key=lambda x: -x[1])
+    return [article for article, _ in scored]
+
+async def search_and_cache(query: AdvancedQuery):
+    search_term = build_search_term(query.query, query.filters)
+    with span("esearch"):
+        pmids = await pubmed_esearch(search_term, retmax=query.retmax)
+    results = await pubmed_efetch_text(pmids, keyword=query.query)
+    if results:
+        await save_results_to_cache(query, results)
     return results
 
 # -----------------------------
 # API Endpoint: Advanced Search
 # -----------------------------
 @app.post("/search/advanced")
-def search_pubmed(query: AdvancedQuery, user_id: str = Depends(get_current_user)):
+async def search_pubmed(query: AdvancedQuery, user_id: str = Depends(get_current_user)):
     if not query.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
 
-    cached = get_cached_results(query.query)
-    results = cached
+    key = cache_key(query.query, query.filters, query.retmax)
+    cached = await get_cached_entry(key)
+    results = cached[0] if cached else None
     source = "cache"
 
     if not results:
-        search_term = build_search_term(query.query, query.filters)
-        pmids = pubmed_esearch(search_term, retmax=query.retmax)
-        results = pubmed_efetch_text(pmids, keyword=query.query)
-        if results:
-            save_results_to_cache(query.query, results)
+        results = await single_flight.do(key, lambda: search_and_cache(query), peek=lambda: get_cached_results(key))
         source = "api"
+    elif cache_age(cached[1]) > ADVANCED_CACHE_FRESH:
+        refresh_in_background(query, key)
 
     # Save user search history
     history_doc = {
         "user_id": user_id,
         "query": query.query,
-        "filters": query.filters.dict() if query.filters else {},
+        "filters": query.filters.model_dump() if query.filters else {},
+        "retmax": query.retmax,
+        # Lets /cache/advanced page over history instead of rebuilding every key
+        "cache_key": key,
         "timestamp": datetime.now(timezone.utc),
         "results_count": len(results),
     }
-    history_collection.insert_one(history_doc)
+    await history_writer.add(history_doc)
 
     return {"source": source, "results": results}
 
+# -----------------------------
+# Lightweight semantic ranking
+# -----------------------------
+# Ranks with the title/abstract vectors the chatbot (and ingest_baseline.py) already stored, read
+# from their Mongo mirror (pubmed_vectors, next to the article store), so articles are never
+# embedded here and no Chroma volume is shared. Only the query is encoded, with the same
+# PubMedBERT backend, loaded on the first semantic search rather than at import time.
+# With SEMANTIC_RANKING=off, or while the model can't be loaded, /search/semantic serves
+# esearch candidates sorted by keyword score as "api", like /search/advanced.
+SEMANTIC_RANKING = os.getenv("SEMANTIC_RANKING", "vectors").lower()
+# After a failed model or store load, requests use keyword order for this long before retrying
+SEMANTIC_RETRY_SECONDS = float(os.getenv("SEMANTIC_RETRY_SECONDS", 300))
+SEMANTIC_POOL = int(os.getenv("SEMANTIC_POOL", 80))
+TITLE_WEIGHT, ABSTRACT_WEIGHT = 0.7, 0.3  # same weighting as the chatbot's semantic_rerank
+
+# Query encoding and vector-store reads get their own small pool, as in the chatbot, so they
+# never queue behind (or starve) the default executor
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+inference_in_flight = REGISTRY.gauge("inference_in_flight", "Calls queued or running on the inference executor")
+
+async def run_inference(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    inference_in_flight.inc()
+    try:
+        return await loop.run_in_executor(inference_executor, partial(fn, *args, **kwargs))
+    finally:
+        inference_in_flight.dec()
+
+_embedding_store = None
+_store_lock = threading.Lock()
+
+def get_embedding_store():
+    global _embedding_store
+    if _embedding_store is None:
+        with _store_lock:
+            if _embedding_store is None:
+                import pubmed_embeddings
+                from embedding_store import open_mongo_store
+                _embedding_store = open_mongo_store(
+                    connection_string, pubmed_embeddings.MODEL_NAME, pubmed_embeddings.POOLING_VERSION)
+    return _embedding_store
+
+_semantic_ready = False
+_semantic_failed_at = None
+
+def load_semantic_stack():
+    """Load PubMedBERT and open the vector store; a failure is remembered for SEMANTIC_RETRY_SECONDS."""
+    global _semantic_ready, _semantic_failed_at
+    try:
+        import pubmed_embeddings
+        pubmed_embeddings.get_backend()
+        get_embedding_store()
+    except Exception:
+        _semantic_failed_at = time.monotonic()
+        raise
+    _semantic_ready = True
+
+def semantic_load_failed_recently():
+    return _semantic_failed_at is not None and time.monotonic() - _semantic_failed_at < SEMANTIC_RETRY_SECONDS
+
+def embed_query(text: str):
+    import pubmed_embeddings
+    return pubmed_embeddings.embed_texts([text])[0]
+
+def rank_by_vectors(query_embedding, pmids: list):
+    """(PMIDs with stored vectors, best cosine first, then the rest in their original order; how many were scored)."""
+    vectors = get_embedding_store().get_many(pmids)
+    scored = [p for p in pmids if p in vectors]
+    if not scored:
+        return pmids, 0
+    matrix = np.stack([TITLE_WEIGHT * vectors[p][0] + ABSTRACT_WEIGHT * vectors[p][1] for p in scored])
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_embedding)
+    sims = np.divide(matrix @ query_embedding, norms, out=np.zeros(len(scored)), where=norms > 0)
+    order = np.argsort(-sims, kind="stable")
+    return [scored[i] for i in order] + [p for p in pmids if p not in vectors], len(scored)
+
+async def rank_candidates(query: str, retmax: int):
+    """Returns (source, ranked PMIDs); "semantic" only if at least one candidate was ranked by its stored vectors.
+
+    Falls back to esearch order ("api", keyword-sorted by semantic_search) if ranking is off,
+    the semantic stack is unavailable or none of the candidates has a stored vector. A failed
+    load is not retried for SEMANTIC_RETRY_SECONDS, so it doesn't tie up an inference worker
+    on every request.
+    """
+    if SEMANTIC_RANKING == "off" or semantic_load_failed_recently():
+        return "api", await pubmed_esearch(query, retmax=retmax)
+    esearch_task = asyncio.create_task(pubmed_esearch(query, retmax=SEMANTIC_POOL))
+    try:
+        if not _semantic_ready:
+            with span("model_load"):
+                await run_inference(load_semantic_stack)
+        with span("query_embedding"):
+            query_embedding = await run_inference(embed_query, query)
+        # The Mongo mirror has no ANN index, so the candidates are esearch's pool alone
+        with span("esearch_wait"):
+            pmids = list(dict.fromkeys(await esearch_task))
+        with span("ranking"):
+            ranked, n_scored = await run_inference(rank_by_vectors, query_embedding, pmids)
+        return ("semantic" if n_scored else "api"), ranked
+    except Exception as e:
+        print(f"Semantic ranking unavailable, using keyword order: {e}")
+        return "api", await esearch_task
+    finally:
+        esearch_task.cancel()
+
+async def semantic_search(query: str, retmax: int):
+    """Returns (source, results): in ranking order, or by keyword score when nothing was ranked ("api")."""
+    source, ranked = await rank_candidates(query, retmax)
+    with span("efetch"):
+        articles = await article_store.fetch(ranked[:retmax], eutils)
+    matcher = KeywordMatcher(query)
+    with span("highlight"):
+        scored = [format_article(a, matcher) for a in articles]
+        if source == "api":
+            # Same order as /search/advanced; stable, so equal scores keep esearch order
+            scored.sort(key=lambda x: -x[1])
+    return source, [article for article, _ in scored]
+
 # -----------------------------
 # API Endpoint: Semantic Search
 # -----------------------------
 @app.post("/search/semantic")
-def search_semantic(query: SemanticQuery, user_id: str = Depends(get_current_user)):
+async def search_semantic(query: SemanticQuery, user_id: str = Depends(get_current_user)):
     if not query.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
 
-    # TODO: Implement actual semantic search logic here.
-    # For now, using the existing keyword-based search as a placeholder.
-    search_term = query.query
-    pmids = pubmed_esearch(search_term, retmax=query.retmax)
-    results = pubmed_efetch_text(pmids, keyword=query.query)
+    source, results = await single_flight.do(
+        flight_key("semantic", hash_query(query.query), query.retmax),
+        lambda: semantic_search(query.query, query.retmax),
+    )
 
     # Save user search history
     history_doc = {
@@ -279,41 +498,212 @@ def search_semantic(query: SemanticQuery, user_id: str = Depends(get_current_use
         "results_count": len(results),
         "search_type": "semantic" # Add a field to distinguish search type
     }
-    history_collection.insert_one(history_doc)
+    await history_writer.add(history_doc)
+
+    return {"source": source, "results": results}
+
+# -----------------------------
+# API Endpoint: Cache and write-behind stats, Prometheus metrics
+# -----------------------------
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "advanced_results": results_cache.stats(),
+        "single_flight": dict(single_flight.stats),
+        "history_writer": history_writer.stats(),
+    }
+
+# Caches and buffers are read at scrape time through their existing stats()
+REGISTRY.watch("cache", results_cache.stats, cache="advanced_results")
+REGISTRY.watch("cache", mongo_cache_stats.stats, cache="advanced_results_mongo")
+REGISTRY.watch("cache", article_store.lookups.stats, cache="articles")
+REGISTRY.watch("cache", lambda: _embedding_store.lookups.stats() if _embedding_store else {}, cache="embeddings")
+REGISTRY.watch("single_flight", lambda: single_flight.stats)
+REGISTRY.watch("write_behind", history_writer.stats, buffer="search_history")
 
-    return {"source": "api", "results": results}
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: stage and upstream latency histograms, errors, in-flight gauges, caches."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+# -----------------------------
+# Pagination: keyset on (timestamp, _id), newest first
+# -----------------------------
+PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 50))
+MAX_PAGE_SIZE = 500
+PAGE_SORT = [("timestamp", -1), ("_id", -1)]
+
+def encode_cursor(doc: dict):
+    ts = doc.get("timestamp")
+    raw = f"{ts.isoformat() if ts else ''}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def after_cursor(cursor: Optional[str]):
+    """Filter matching documents that sort after the cursor's (timestamp, _id)."""
+    if not cursor:
+        return {}
+    try:
+        ts, oid = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        ts, oid = datetime.fromisoformat(ts), ObjectId(oid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [{"timestamp": {"$lt": ts}}, {"timestamp": ts, "_id": {"$lt": oid}}]}
+
+def ndjson_response(cursor):
+    """Stream any async iterable of documents (a Mongo cursor or a generator) as NDJSON."""
+    async def lines():
+        async for doc in cursor:
+            doc.pop("_id", None)
+            yield json.dumps(jsonable_encoder(doc)) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def page_filter(filter_: dict, cursor: Optional[str]):
+    return {"$and": [filter_, page]} if (page := after_cursor(cursor)) else filter_
+
+async def fetch_page(collection, filter_: dict, projection: Optional[dict], limit: int, cursor: Optional[str]):
+    """(documents without _id, next_cursor) for one keyset page."""
+    docs = await collection.find(page_filter(filter_, cursor), projection).sort(PAGE_SORT).limit(limit + 1).to_list()
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    docs = docs[:limit]
+    for doc in docs:
+        doc.pop("_id", None)
+    return docs, next_cursor
+
+async def paginate(collection, filter_: dict, projection: dict, limit: int, cursor: Optional[str], format: str, field: str):
+    """One page as {field: [...], "next_cursor": ...}, or the whole remaining set as NDJSON."""
+    if format == "ndjson":
+        # Exports stream straight from the Mongo cursor; nothing is buffered
+        return ndjson_response(collection.find(page_filter(filter_, cursor), projection).sort(PAGE_SORT))
+
+    docs, next_cursor = await fetch_page(collection, filter_, projection, limit, cursor)
+    return {field: docs, "next_cursor": next_cursor}
 
 # -----------------------------
 # API Endpoint: Get User History
 # -----------------------------
 @app.get("/history")
-def get_history(user_id: str = Depends(get_current_user)):
-    history = list(history_collection.find({"user_id": user_id}, {"_id": 0}))
-    return {"history": history}
+async def get_history(
+    user_id: str = Depends(get_current_user),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    return await paginate(history_collection, {"user_id": user_id}, None, limit, cursor, format, "history")
+
+@app.get("/history/summary")
+async def get_history_summary(user_id: str = Depends(get_current_user)):
+    """Totals over the user's whole history (not just one page), aggregated in Mongo."""
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": {"$ifNull": ["$mode", {"$ifNull": ["$search_type", "advanced"]}]},
+            "count": {"$sum": 1},
+            "results": {"$sum": {"$ifNull": ["$results_count", 0]}},
+        }},
+    ]
+    groups = await (await history_collection.aggregate(pipeline)).to_list()
+    total = sum(g["count"] for g in groups)
+    return {
+        "total_queries": total,
+        "avg_results": round(sum(g["results"] for g in groups) / total, 2) if total else 0,
+        "modes": {g["_id"]: g["count"] for g in groups},
+    }
 
 # -----------------------------
 # API Endpoint: List cached advanced queries (filtered by current user)
 # -----------------------------
-@app.get("/cache/advanced")
-def list_cached_advanced(user_id: str = Depends(get_current_user)):
-    # Collect this user's queries from history and hash them
-    user_history = list(history_collection.find({"user_id": user_id}, {"_id": 0, "query": 1}))
-    query_hashes = list({hash_query(h.get("query", "")) for h in user_history if h.get("query")})
-
-    if not query_hashes:
-        return {"items": []}
-
-    # Fetch only cached items whose query_hash is in the user's set
-    items = list(
-        advanced_collection.find(
-            {"query_hash": {"$in": query_hashes}},
-            {"_id": 0}
-        )
-    )
+HISTORY_FIELDS = {"query": 1, "filters": 1, "retmax": 1, "cache_key": 1, "timestamp": 1}
+
+def history_cache_ref(h: dict):
+    """("cache_key", key) or, for history written before filter-aware keys, ("query_hash", hash)."""
+    if h.get("cache_key"):
+        return "cache_key", h["cache_key"]
+    if not h.get("query"):
+        return None
+    if "retmax" in h:
+        filters = SearchFilters(**h["filters"]) if h.get("filters") else None
+        return "cache_key", cache_key(h["query"], filters, h["retmax"])
+    return "query_hash", hash_query(h["query"])
+
+async def cached_items(history: list, projection: Optional[dict], seen: set):
+    """Cache entries for one page of history, in history order, skipping refs already in `seen`."""
+    refs = [ref for ref in map(history_cache_ref, history) if ref and ref not in seen]
+    if not refs:
+        return []
+    keys = [v for kind, v in refs if kind == "cache_key"]
+    hashes = [v for kind, v in refs if kind == "query_hash"]
+    filter_ = {"$or": [
+        {"cache_key": {"$in": keys}},
+        {"query_hash": {"$in": hashes}, "cache_key": {"$exists": False}},
+    ]}
+    found = {}
+    async for doc in advanced_collection.find(filter_, projection):
+        doc.pop("_id", None)
+        ref = ("cache_key", doc["cache_key"]) if doc.get("cache_key") else ("query_hash", doc.get("query_hash"))
+        found.setdefault(ref, doc)
+    items = []
+    for ref in refs:
+        if ref in found and ref not in seen:
+            seen.add(ref)
+            items.append(found[ref])
+    return items
+
+async def refs_listed_before(filter_: dict, cursor: Optional[str], history: list):
+    """Cache refs of this page that newer history (before `cursor`) already listed on an earlier page."""
+    if not cursor or not history:
+        return set()
+    keys = [h["cache_key"] for h in history if h.get("cache_key")]
+    queries = [h["query"] for h in history if h.get("query")]
+    newer = {"$and": [filter_, {"$nor": [after_cursor(cursor)]},
+                      {"$or": [{"cache_key": {"$in": keys}}, {"query": {"$in": queries}}]}]}
+    return {ref async for h in history_collection.find(newer, HISTORY_FIELDS) if (ref := history_cache_ref(h))}
+
+# History pages read per /cache/advanced request while looking for one with a cached entry
+MAX_EMPTY_PAGES = 10
 
-    # Optional: sort by timestamp desc if present
-    try:
-        items.sort(key=lambda x: x.get("timestamp", 0), reverse=True)
-    except Exception:
-        pass
-    return {"items": items}
+@app.get("/cache/advanced")
+async def list_cached_advanced(
+    user_id: str = Depends(get_current_user),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """Cached results for the user's own advanced searches, newest search first.
+
+    Pages walk the user's search history (keyset on timestamp, _id), and each page looks
+    up only its own cache keys, so no request reads the whole history. A cache entry is
+    listed once, at the user's newest search for it; searches whose entry has expired are
+    skipped. A page whose searches have no cached entry is skipped too (up to
+    MAX_EMPTY_PAGES at a time), so `items` is only empty when `next_cursor` says so or
+    the scan limit was reached.
+    """
+    # summary=true leaves the result bodies in Mongo and returns their count instead
+    projection = {
+        "query": 1, "filters": 1, "retmax": 1, "timestamp": 1, "cache_key": 1, "query_hash": 1,
+        "results_count": {"$size": {"$ifNull": ["$results", []]}},
+    } if summary else None
+    filter_ = {"user_id": user_id, "search_type": {"$exists": False}}
+
+    if format == "ndjson":
+        async def export():
+            seen, page_cursor = set(), cursor
+            while True:
+                history, page_cursor = await fetch_page(history_collection, filter_, HISTORY_FIELDS, MAX_PAGE_SIZE, page_cursor)
+                for item in await cached_items(history, projection, seen):
+                    yield item
+                if not page_cursor:
+                    break
+
+        return ndjson_response(export())
+
+    next_cursor = cursor
+    for _ in range(MAX_EMPTY_PAGES):
+        page_cursor = next_cursor
+        history, next_cursor = await fetch_page(history_collection, filter_, HISTORY_FIELDS, limit, page_cursor)
+        seen = await refs_listed_before(filter_, page_cursor, history)
+        items = await cached_items(history, projection, seen)
+        if items or not next_cursor:
+            break
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,157 @@
+# -----------------------------
+# pubmed_embeddings.py (PubMedBERT mean-pooled embeddings with pluggable inference backends)
+# -----------------------------
+import os
+import threading
+
+import numpy as np
+
+MODEL_NAME = "microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract-fulltext"
+EMBEDDING_DIM = 768
+POOLING_VERSION = "mean-v1"  # bump when the pooling in embed_texts changes
+MAX_LENGTH = 512
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 16))
+
+# torch = fp32 eager (baseline), torch-int8 = dynamic int8 quantization of the Linear layers,
+# onnx = exported graph run by ONNX Runtime (exported once to ONNX_MODEL_PATH)
+BACKENDS = ("torch", "torch-int8", "onnx")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "./onnx/pubmedbert.onnx")
+NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", 0))  # 0 = library default
+
+
+def mean_pool(token_embeddings, attention_mask):
+    mask = attention_mask[..., None].astype(token_embeddings.dtype)
+    summed = (token_embeddings * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    return summed / counts
+
+
+class TorchBackend:
+    def __init__(self, model_name=MODEL_NAME, quantize=False):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self.torch = torch
+        if NUM_THREADS:
+            torch.set_num_threads(NUM_THREADS)
+        self.name = "torch-int8" if quantize else "torch"
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+
+    def embed_batch(self, inputs):
+        """Mean-pooled (batch, 768) embeddings for one padded batch of numpy inputs."""
+        torch = self.torch
+        with torch.no_grad():
+            tensors = {k: torch.from_numpy(v) for k, v in inputs.items()}
+            token_embeddings = self.model(**tensors).last_hidden_state
+            mask = tensors["attention_mask"].unsqueeze(-1).expand(token_embeddings.size()).float()
+            summed = torch.sum(token_embeddings * mask, 1)
+            counts = torch.clamp(mask.sum(1), min=1e-9)
+            return (summed / counts).numpy()
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, model_name=MODEL_NAME, onnx_path=ONNX_MODEL_PATH):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if not os.path.exists(onnx_path):
+            self.export(model_name, onnx_path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if NUM_THREADS:
+            options.intra_op_num_threads = NUM_THREADS
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def export(self, model_name, onnx_path):
+        import torch
+        from transformers import AutoModel
+
+        print(f"Exporting {model_name} to {onnx_path} ...")
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = self.tokenizer(["onnx export sample"], return_tensors="pt")
+        names = ["input_ids", "attention_mask", "token_type_ids"]
+        dynamic = {0: "batch", 1: "sequence"}
+        os.makedirs(os.path.dirname(onnx_path) or ".", exist_ok=True)
+        torch.onnx.export(
+            model,
+            tuple(sample[n] for n in names),
+            onnx_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{n: dynamic for n in names}, "last_hidden_state": dynamic},
+            opset_version=17,
+            dynamo=False,
+        )
+
+    def embed_batch(self, inputs):
+        feed = {k: v for k, v in inputs.items() if k in self.input_names}
+        (token_embeddings,) = self.session.run(["last_hidden_state"], feed)
+        return mean_pool(token_embeddings, inputs["attention_mask"]).astype(np.float32)
+
+
+def load_backend(name=EMBEDDING_BACKEND, model_name=MODEL_NAME):
+    if name == "torch":
+        return TorchBackend(model_name)
+    if name == "torch-int8":
+        return TorchBackend(model_name, quantize=True)
+    if name == "onnx":
+        return OnnxBackend(model_name)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {name!r}, expected one of {BACKENDS}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = load_backend()
+    return _backend
+
+
+def is_loaded():
+    return _backend is not None
+
+
+def tokenize(texts, backend=None):
+    """Unpadded encodings (one dict of id lists per text), ready for length-bucketing."""
+    backend = backend or get_backend()
+    encoded = backend.tokenizer(list(texts), truncation=True, max_length=MAX_LENGTH)
+    return [{k: encoded[k][j] for k in encoded.keys()} for j in range(len(texts))]
+
+
+def embed_features(features, batch_size=EMBED_BATCH_SIZE, backend=None):
+    """Embed pre-tokenized features in length-bucketed, padded batches; returns (N, 768)."""
+    backend = backend or get_backend()
+    embeddings = np.zeros((len(features), EMBEDDING_DIM), dtype=np.float32)
+
+    # Length-bucketing: sort by token count so each batch pads to a similar length
+    order = sorted(range(len(features)), key=lambda j: len(features[j]["input_ids"]))
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        inputs = backend.tokenizer.pad([features[j] for j in bucket], return_tensors="np")
+        inputs = {k: v.astype(np.int64) for k, v in inputs.items()}
+        embeddings[bucket] = backend.embed_batch(inputs)
+    return embeddings
+
+
+def embed_texts(texts, batch_size=EMBED_BATCH_SIZE, backend=None):
+    """Embed many texts at once; returns an (N, 768) matrix, zero rows for empty texts."""
+    embeddings = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    indices = [i for i, t in enumerate(texts) if t]
+    if indices:
+        features = tokenize([texts[i] for i in indices], backend=backend)
+        embeddings[indices] = embed_features(features, batch_size=batch_size, backend=backend)
+    return embeddings
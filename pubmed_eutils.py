@@ -0,0 +1,260 @@
+# -----------------------------
+# pubmed_eutils.py (shared NCBI E-utilities client for both FastAPI services)
+# -----------------------------
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from xml.etree import ElementTree
+
+import httpx
+from pymongo.errors import DuplicateKeyError
+
+from metrics import STAGE_SECONDS, UPSTREAM_ERRORS, span, upstream_call
+
+EUTILS_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """In-process token bucket awaited from the event loop; only limits this process."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _try_take(self):
+        """Take a token if one is available, otherwise return the seconds until one is."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire_async(self):
+        # Nothing is reserved while sleeping, so a cancelled caller never spends quota
+        while (wait := self._try_take()) > 0:
+            await asyncio.sleep(wait)
+
+    async def ensure_indexes(self):
+        pass
+
+
+class SharedRateLimit:
+    """NCBI's per-key rate limit shared by every process that uses the key, through Mongo.
+
+    Time is cut into slots of 1/rate seconds. A request claims the first free slot by
+    inserting its document (`_id` = slot number) and sleeps until that slot starts, so
+    across both services and all their replicas at most `rate` requests start in any
+    wall-clock second. Unlike TokenBucket the slot is reserved while sleeping: a caller
+    cancelled meanwhile spends it. If Mongo is unreachable the local `fallback` bucket
+    is used, which only limits this process.
+    """
+
+    def __init__(self, collection, rate, fallback, slot_ttl=60):
+        self.collection = collection
+        self.rate = float(rate)
+        self.fallback = fallback
+        self.slot_ttl = slot_ttl
+        # First slot this process has not handed out yet
+        self._next_slot = 0
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def _slot_start(self, slot):
+        return slot / self.rate
+
+    def _claim(self):
+        """Next slot not handed out by this process, never one already past.
+
+        Claimed before awaiting Mongo, so concurrent callers in one process try
+        different slots and an insert only collides with another process's claim.
+        """
+        slot = max(int(time.time() * self.rate), self._next_slot)
+        self._next_slot = slot + 1
+        return slot
+
+    async def acquire_async(self):
+        slot = self._claim()
+        while True:
+            expires_at = datetime.fromtimestamp(self._slot_start(slot), timezone.utc) + timedelta(seconds=self.slot_ttl)
+            try:
+                await self.collection.insert_one({"_id": slot, "expires_at": expires_at})
+                break
+            except DuplicateKeyError:
+                slot = self._claim()  # taken by another process
+            except Exception as e:
+                print(f"⚠️ Shared NCBI rate limit unavailable, limiting this process only: {e}")
+                return await self.fallback.acquire_async()
+        if (wait := self._slot_start(slot) - time.time()) > 0:
+            await asyncio.sleep(wait)
+
+
+def parse_esearch_ids(content):
+    root = ElementTree.fromstring(content)
+    return [id_elem.text for id_elem in root.findall(".//Id")]
+
+
+def extract_article(article):
+    """Plain dict for one <PubmedArticle>; each service maps it onto its own response shape."""
+    authors = []
+    for author in article.findall(".//Author"):
+        lastname = author.findtext("LastName")
+        initials = author.findtext("Initials")
+        if lastname and initials:
+            authors.append(f"{lastname} {initials}")
+    return {
+        "pmid": article.findtext(".//PMID"),
+        "title": article.findtext(".//ArticleTitle"),
+        "abstract": article.findtext(".//Abstract/AbstractText") or article.findtext(".//AbstractText"),
+        "journal": article.findtext(".//Journal/Title"),
+        "year": article.findtext(".//PubDate/Year"),
+        "authors": authors,
+    }
+
+
+class PubmedArticleParser:
+    """Incremental efetch parser: feed it raw bytes as they arrive, get back finished articles.
+
+    Each <PubmedArticle> is cleared and detached from the root as soon as it has been
+    extracted, so memory stays flat however many records the response holds.
+    """
+
+    def __init__(self):
+        self._parser = ElementTree.XMLPullParser(events=("start", "end"))
+        self._root = None
+
+    def feed(self, data):
+        self._parser.feed(data)
+        return list(self._drain())
+
+    def close(self):
+        self._parser.close()
+        return list(self._drain())
+
+    def _drain(self):
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = elem
+                continue
+            if elem.tag == "PubmedArticle":
+                yield extract_article(elem)
+                elem.clear()
+                self._root.clear()
+
+
+def iter_pubmed_articles(chunks):
+    """Yield article dicts from an iterable of XML byte chunks (e.g. a response or a gzip file)."""
+    parser = PubmedArticleParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+class EutilsClient:
+    """Keep-alive, rate-limited asyncio E-utilities client.
+
+    NCBI allows 3 requests/s without an API key and 10 requests/s with one, per key
+    rather than per process. With a `rate_collection` (async Mongo) every client using
+    it draws from one SharedRateLimit; without one, from a TokenBucket of its own.
+    429 and 5xx responses, timeouts and connection errors are retried with exponential
+    backoff (honouring Retry-After).
+    """
+
+    def __init__(self, api_key=None, rate=None, burst=None, timeout=10.0, max_retries=3, max_connections=10,
+                 rate_collection=None):
+        self.api_key = api_key
+        rate = rate or float(os.getenv("NCBI_RATE_LIMIT", 10 if api_key else 3))
+        burst = burst or float(os.getenv("NCBI_BURST", 1))
+        self.bucket = TokenBucket(rate, capacity=burst)
+        if rate_collection is not None:
+            self.bucket = SharedRateLimit(rate_collection, rate, fallback=self.bucket)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._async_client = None
+
+    async def ensure_indexes(self):
+        await self.bucket.ensure_indexes()
+
+    @property
+    def async_client(self):
+        # Created on first use so it binds to the server's running event loop
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(base_url=EUTILS_BASE_URL, timeout=self.timeout, limits=self.limits)
+        return self._async_client
+
+    def _params(self, params):
+        params = {"db": "pubmed", **params}
+        if self.api_key:
+            params["api_key"] = self.api_key
+        return params
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return 0.5 * (2 ** attempt) + random.uniform(0, 0.25)
+
+    async def _asend(self, endpoint, params, stream=False):
+        request = self.async_client.build_request("GET", endpoint, params=self._params(params))
+        for attempt in range(self.max_retries + 1):
+            # Time spent queued for the rate limit is its own stage, not NCBI latency
+            with span("ncbi_rate_wait"):
+                await self.bucket.acquire_async()
+            try:
+                with upstream_call("ncbi"):
+                    response = await self.async_client.send(request, stream=stream)
+                if response.is_error:
+                    UPSTREAM_ERRORS.inc(upstream="ncbi")
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                break
+            await response.aclose()
+            await asyncio.sleep(self._backoff(attempt, response))
+        if response.is_error:
+            await response.aclose()
+        response.raise_for_status()
+        return response
+
+    async def arequest(self, endpoint, params):
+        return await self._asend(endpoint, params)
+
+    async def aesearch(self, term, retmax=20):
+        response = await self.arequest("esearch.fcgi", {"term": term, "retmax": retmax, "retmode": "xml"})
+        return parse_esearch_ids(response.content)
+
+    async def aefetch_articles(self, pmids):
+        """Yield article dicts while the efetch response is still downloading."""
+        if not pmids:
+            return
+        response = await self._asend("efetch.fcgi", {"id": ",".join(pmids), "retmode": "xml"}, stream=True)
+        parse_seconds = 0.0
+        try:
+            parser = PubmedArticleParser()
+            async for chunk in response.aiter_bytes():
+                start = time.perf_counter()
+                articles = parser.feed(chunk)
+                parse_seconds += time.perf_counter() - start
+                for article in articles:
+                    yield article
+            for article in parser.close():
+                yield article
+        finally:
+            STAGE_SECONDS.observe(parse_seconds, stage="xml_parse")
+            await response.aclose()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
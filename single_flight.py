@@ -0,0 +1,101 @@
+# -----------------------------
+# single_flight.py (request coalescing for identical in-flight queries, shared by both services)
+# -----------------------------
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+
+def flight_key(*parts):
+    """Stable hash of the parts that make two requests identical (query, filters, mode, ...)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one computation.
+
+    Within a worker, the first caller runs `fn` in its own task and later callers
+    await the same task, so one caller disconnecting never cancels the others.
+
+    With a `lock_collection` (async Mongo) and a `peek`, the leader also takes a lock
+    document (`_id` = key) so other workers can wait for it. A waiting worker polls
+    `peek()`, typically a read of the shared cache, until it returns a result, the lock is
+    released or `lock_ttl` expires. If `peek()` still has nothing at that point, the worker
+    runs `fn` itself. Without a `peek` a waiting worker could never see the leader's
+    result, so such calls only coalesce within the worker.
+    """
+
+    def __init__(self, lock_collection=None, lock_ttl=30, poll_interval=0.2):
+        self.lock_collection = lock_collection
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self.stats = {"leaders": 0, "coalesced": 0, "remote_waits": 0, "remote_hits": 0}
+        self._inflight = {}
+
+    async def ensure_indexes(self):
+        if self.lock_collection is not None:
+            # Backstop for locks left behind by a crashed worker
+            await self.lock_collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def do(self, key, fn, peek=None):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["leaders"] += 1
+            task = asyncio.ensure_future(self._run(key, fn, peek))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _run(self, key, fn, peek):
+        if self.lock_collection is None or peek is None:
+            return await fn()
+        locked = await self._acquire(key)
+        if locked is False:
+            self.stats["remote_waits"] += 1
+            result = await self._wait(key, peek)
+            if result is not None:
+                self.stats["remote_hits"] += 1
+                return result
+        try:
+            return await fn()
+        finally:
+            if locked:
+                await self._release(key)
+
+    async def _acquire(self, key):
+        now = datetime.now(timezone.utc)
+        try:
+            await self.lock_collection.insert_one({"_id": key, "expires_at": now + timedelta(seconds=self.lock_ttl)})
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            # Mongo trouble only costs the cross-worker sharing, never the request
+            print(f"⚠️ Single-flight lock unavailable: {e}")
+            return None
+
+    async def _release(self, key):
+        try:
+            await self.lock_collection.delete_one({"_id": key})
+        except Exception as e:
+            print(f"⚠️ Single-flight lock release failed: {e}")
+
+    async def _wait(self, key, peek):
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + self.lock_ttl
+        while loop.time() < give_up_at:
+            if peek is not None and (result := await peek()) is not None:
+                return result
+            try:
+                live = {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+                if await self.lock_collection.find_one(live, {"_id": 1}) is None:
+                    break
+            except Exception:
+                break
+            await asyncio.sleep(self.poll_interval)
+        return await peek() if peek is not None else None
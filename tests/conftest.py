@@ -0,0 +1,66 @@
+import os
+
+import mongomock
+import pytest
+
+# The services refuse to import without these; tests never reach Mongo, Groq or Gemini.
+# MONGO_URI is overridden, not defaulted: CI exports the production one at job level.
+os.environ.setdefault("GROQ_API", "test")
+os.environ["MONGO_URI"] = "mongodb://localhost:27017/?serverSelectionTimeoutMS=100"
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length=None):
+        return list(self._cursor)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._cursor:
+            yield doc
+
+
+class AsyncCollection:
+    """The slice of pymongo's async collection API the services use, over mongomock."""
+
+    def __init__(self, collection):
+        self.sync = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.sync.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline):
+        return AsyncCursor(self.sync.aggregate(pipeline))
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, db):
+        self.sync = db
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.sync[name])
+
+
+@pytest.fixture
+def mongo():
+    return AsyncDatabase(mongomock.MongoClient(tz_aware=True)["pubmed_db"])
@@ -0,0 +1,92 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import pubmed_advanced_api_only as api
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def client(mongo, monkeypatch):
+    monkeypatch.setattr(api, "history_collection", mongo["search_history"])
+    monkeypatch.setattr(api, "advanced_collection", mongo["articles"])
+    api.app.dependency_overrides[api.get_current_user] = lambda: "u"
+    yield TestClient(api.app)
+    api.app.dependency_overrides.clear()
+
+
+def seed(mongo, n):
+    """n advanced searches by u (query i % 40, so repeats), every third one cached; noise from others."""
+    history = []
+    for i in range(n):
+        query = f"query {i % 40}"
+        key = api.cache_key(query, None, 10)
+        history.append({"user_id": "u", "query": query, "filters": {}, "retmax": 10, "cache_key": key,
+                        "timestamp": START + timedelta(minutes=i), "results_count": i % 7})
+    history.append({"user_id": "u", "query": "semantic", "filters": {}, "search_type": "semantic",
+                    "timestamp": START, "results_count": 3})
+    history.append({"user_id": "someone-else", "query": "query 0", "filters": {}, "retmax": 10,
+                    "cache_key": api.cache_key("query 0", None, 10), "timestamp": START, "results_count": 1})
+    mongo["search_history"].sync.insert_many(history)
+    mongo["articles"].sync.insert_many([
+        {"cache_key": api.cache_key(f"query {q}", None, 10), "query": f"query {q}", "results": [{"PMID": str(q)}],
+         "timestamp": START, "cached_at": START}
+        for q in range(0, 40, 3)
+    ])
+
+
+def test_cache_advanced_pages_over_history_newest_first(client, mongo):
+    seed(mongo, 120)
+    pages, cursor = [], None
+    while True:
+        body = client.get("/cache/advanced", params={"limit": 50, **({"cursor": cursor} if cursor else {})}).json()
+        pages.append([item["query"] for item in body["items"]])
+        if not (cursor := body["next_cursor"]):
+            break
+
+    # Newest search (i=119 -> query 39) first; only cached queries; each listed once across pages
+    assert pages[0][0] == "query 39"
+    listed = [q for page in pages for q in page]
+    assert sorted(listed) == sorted(f"query {q}" for q in range(0, 40, 3))
+    # Older pages only repeat queries already listed: they are scanned in one request, which ends the listing
+    assert pages[1:] == [[]]
+
+
+def test_cache_advanced_skips_pages_without_cached_entries(client, mongo):
+    seed(mongo, 40)
+    # 100 newer searches with nothing cached push the cached ones three pages back
+    mongo["search_history"].sync.insert_many([
+        {"user_id": "u", "query": f"uncached {i}", "filters": {}, "retmax": 10,
+         "cache_key": api.cache_key(f"uncached {i}", None, 10), "timestamp": START + timedelta(hours=1, minutes=i)}
+        for i in range(100)
+    ])
+    body = client.get("/cache/advanced", params={"limit": 30}).json()
+    assert body["items"] and body["items"][0]["query"] == "query 39"
+
+
+def test_cache_advanced_export_lists_each_entry_once(client, mongo):
+    seed(mongo, 120)
+    response = client.get("/cache/advanced", params={"format": "ndjson"})
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(item["query"] for item in items) == sorted(f"query {q}" for q in range(0, 40, 3))
+    assert all(item["results"] for item in items)
+
+
+def test_cache_advanced_finds_legacy_history_by_query_hash(client, mongo):
+    mongo["search_history"].sync.insert_one({"user_id": "u", "query": "Old Query", "filters": {}, "timestamp": START})
+    mongo["articles"].sync.insert_one({"query_hash": api.hash_query("Old Query"), "query": "Old Query",
+                                       "results": [], "timestamp": START})
+    assert [i["query"] for i in client.get("/cache/advanced").json()["items"]] == ["Old Query"]
+
+
+def test_history_summary_counts_the_whole_history(client, mongo):
+    seed(mongo, 120)
+    assert len(client.get("/history").json()["history"]) == api.PAGE_SIZE
+    summary = client.get("/history/summary").json()
+    assert summary["total_queries"] == 121
+    assert summary["modes"] == {"advanced": 120, "semantic": 1}
+    expected = (sum(i % 7 for i in range(120)) + 3) / 121
+    assert summary["avg_results"] == round(expected, 2)
@@ -0,0 +1,107 @@
+import asyncio
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+import embedding_store
+import pubmed_advanced_api_only as api
+
+
+class FakeStore:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def get_many(self, pmids):
+        return {p: self.vectors[p] for p in pmids if p in self.vectors}
+
+    def nearest(self, query, k):
+        return []
+
+
+@pytest.fixture
+def semantic(monkeypatch):
+    async def esearch(query, retmax):
+        return ["1", "2", "3"][:retmax]
+
+    monkeypatch.setattr(api, "pubmed_esearch", esearch)
+    monkeypatch.setattr(api, "embed_query", lambda text: np.array([1.0, 0.0]))
+    monkeypatch.setattr(api, "_semantic_ready", True)
+
+    def use(vectors):
+        monkeypatch.setattr(api, "_embedding_store", FakeStore(vectors))
+
+    return use
+
+
+def test_no_stored_vectors_is_reported_as_api(semantic):
+    semantic({})
+    assert asyncio.run(api.rank_candidates("q", 3)) == ("api", ["1", "2", "3"])
+
+
+def test_scored_candidates_come_first(semantic):
+    far, close = (np.array([0.0, 1.0]),) * 2, (np.array([1.0, 0.0]),) * 2
+    semantic({"2": far, "3": close})
+    assert asyncio.run(api.rank_candidates("q", 3)) == ("semantic", ["3", "2", "1"])
+
+
+def test_ranking_off_skips_the_model(semantic, monkeypatch):
+    monkeypatch.setattr(api, "SEMANTIC_RANKING", "off")
+    monkeypatch.setattr(api, "embed_query", lambda text: pytest.fail("model loaded"))
+    assert asyncio.run(api.rank_candidates("q", 2)) == ("api", ["1", "2"])
+
+
+def test_failed_load_is_not_retried_until_the_backoff_expires(semantic, monkeypatch):
+    semantic({})
+    loads = []
+
+    def get_backend():
+        loads.append(1)
+        raise OSError("no weights")
+
+    monkeypatch.setitem(sys.modules, "pubmed_embeddings", types.SimpleNamespace(get_backend=get_backend))
+    monkeypatch.setattr(api, "_semantic_ready", False)
+    monkeypatch.setattr(api, "_semantic_failed_at", None)
+    for _ in range(3):
+        assert asyncio.run(api.rank_candidates("q", 2))[0] == "api"
+    assert len(loads) == 1
+
+    monkeypatch.setattr(api, "SEMANTIC_RETRY_SECONDS", 0)
+    asyncio.run(api.rank_candidates("q", 2))
+    assert len(loads) == 2
+
+
+def test_unranked_results_are_sorted_by_keyword_score(semantic, monkeypatch):
+    semantic({})
+
+    async def fetch(pmids, eutils):
+        fields = {"1": ("Unrelated", "Nothing here"), "2": ("Heart study", "Low-dose aspirin"), "3": ("Aspirin trial", "")}
+        return [{"pmid": p, "title": t, "abstract": a, "journal": "", "year": "", "authors": []}
+                for p, (t, a) in ((p, fields[p]) for p in pmids)]
+
+    monkeypatch.setattr(api.article_store, "fetch", fetch)
+    source, results = asyncio.run(api.semantic_search("aspirin", 3))
+    assert source == "api"
+    assert [r["PMID"] for r in results] == ["3", "2", "1"]
+
+
+def test_embedding_store_opened_once_across_threads(monkeypatch):
+    opened = []
+
+    def slow_open(*args):
+        time.sleep(0.05)
+        opened.append(object())
+        return opened[-1]
+
+    monkeypatch.setattr(api, "_embedding_store", None)
+    monkeypatch.setattr(embedding_store, "open_mongo_store", slow_open)
+    threads = [threading.Thread(target=api.get_embedding_store) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(opened) == 1
+    assert api.get_embedding_store() is opened[0]
@@ -0,0 +1,45 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pubmed_advanced_api_only as api
+from cache_utils import LRUCache
+from pubmed_advanced_api_only import SearchFilters, cache_key
+
+
+def test_query_case_and_whitespace_do_not_matter():
+    assert cache_key("  CRISPR   Cas9 ") == cache_key("crispr cas9")
+
+
+def test_no_filters_equals_default_filters():
+    assert cache_key("q", None, 10) == cache_key("q", SearchFilters(), 10)
+
+
+def test_list_filter_order_does_not_matter():
+    a = SearchFilters(article_types=["Review", "Clinical Trial"], languages=["English"])
+    b = SearchFilters(languages=["English"], article_types=["Clinical Trial", "Review"])
+    assert cache_key("q", a) == cache_key("q", b)
+
+
+def test_filters_and_retmax_change_the_key():
+    base = cache_key("q", None, 10)
+    assert cache_key("q", None, 20) != base
+    assert cache_key("q", SearchFilters(pub_year_range="5")) != base
+    assert cache_key("q", SearchFilters(custom_range=(2010, 2020))) != cache_key("q", SearchFilters(custom_range=(2010, 2021)))
+    assert cache_key("other q", None, 10) != base
+
+
+def test_entry_read_from_mongo_keeps_only_its_remaining_ttl(mongo, monkeypatch):
+    monkeypatch.setattr(api, "advanced_collection", mongo["articles"])
+    monkeypatch.setattr(api, "results_cache", LRUCache(maxsize=8, ttl=api.ADVANCED_CACHE_TTL))
+    now = datetime.now(timezone.utc)
+    mongo["articles"].sync.insert_many([
+        {"cache_key": "old", "results": [{"PMID": "1"}], "cached_at": now - timedelta(seconds=api.ADVANCED_CACHE_TTL - 60)},
+        {"cache_key": "expired", "results": [{"PMID": "2"}], "cached_at": now - timedelta(seconds=api.ADVANCED_CACHE_TTL + 60)},
+    ])
+    assert asyncio.run(api.get_cached_entry("old"))[0] == [{"PMID": "1"}]
+    _, expires_at = api.results_cache._data["old"]
+    assert expires_at - time.monotonic() <= 60
+    # Past its TTL but not yet removed by Mongo: served, not kept in memory
+    assert asyncio.run(api.get_cached_entry("expired"))[0] == [{"PMID": "2"}]
+    assert "expired" not in api.results_cache._data
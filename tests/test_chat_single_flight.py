@@ -0,0 +1,61 @@
+import asyncio
+import datetime
+
+import pytest
+
+import chatbot_api
+from single_flight import SingleFlight, flight_key
+
+
+@pytest.fixture
+def chat(mongo, monkeypatch):
+    monkeypatch.setattr(chatbot_api, "collection", mongo["chatbot_articles"])
+    monkeypatch.setattr(chatbot_api, "single_flight", SingleFlight(mongo["inflight_locks"], lock_ttl=2, poll_interval=0.01))
+    return mongo
+
+
+def test_waiting_worker_reuses_an_answer_to_the_same_normalized_question(chat, monkeypatch):
+    async def no_groq(prompt, mode):
+        raise AssertionError("duplicate Groq call")
+
+    monkeypatch.setattr(chatbot_api, "generate_groq_response", no_groq)
+
+    async def other_worker():
+        # Holds the flight lock, answers "Explain CRISPR", then releases
+        key = flight_key("chat", "Concept", chatbot_api.preprocess_query("explain crispr"))
+        await chat["inflight_locks"].insert_one({"_id": key, "expires_at": datetime.datetime.now(datetime.timezone.utc)
+                                                 + datetime.timedelta(seconds=2)})
+        await asyncio.sleep(0.05)
+        await chatbot_api.save_to_mongo("Explain CRISPR", "CRISPR is ...", "Concept", "student-a")
+        await chat["inflight_locks"].delete_one({"_id": key})
+
+    async def main():
+        answering = asyncio.create_task(other_worker())
+        await asyncio.sleep(0.01)
+        result = await chatbot_api.answer_chat("explain crispr", "Concept", "student-b")
+        await answering
+        return result
+
+    assert asyncio.run(main()) == ("new", "CRISPR is ...")
+    saved = chat["chatbot_articles"].sync.find_one({"user_id": "student-b"})
+    assert saved["llm_response"] == "CRISPR is ..." and saved["normalized_query"] == "explain crispr"
+
+
+def test_leader_saves_the_answer_before_releasing_the_lock(chat, monkeypatch):
+    async def groq(prompt, mode):
+        return "answer"
+
+    monkeypatch.setattr(chatbot_api, "generate_groq_response", groq)
+    flight = chatbot_api.single_flight
+    release = flight._release
+    saved_at_release = []
+
+    async def checked_release(key):
+        saved_at_release.append(chat["chatbot_articles"].sync.count_documents({}))
+        await release(key)
+
+    monkeypatch.setattr(flight, "_release", checked_release)
+    assert asyncio.run(chatbot_api.answer_chat("What is CRISPR?", "Concept", "student-a")) == ("new", "answer")
+    assert saved_at_release == [1]
+    # Saved once, by the flight, not again afterwards
+    assert chat["chatbot_articles"].sync.count_documents({"user_id": "student-a"}) == 1
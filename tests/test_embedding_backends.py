@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pytest
+
+import pubmed_embeddings
+
+# Same bar as benchmarks/embedding_backends.py --min-cosine
+MIN_COSINE = 0.99
+
+TEXTS = [
+    "CRISPR-Cas9 gene editing for sickle cell disease",
+    "Gut microbiome composition and response to metformin in type 2 diabetes",
+    "Tau aggregation and neuroinflammation in early Alzheimer's disease",
+    "Single-cell RNA sequencing reveals heterogeneity of tumor-infiltrating T cells in melanoma. "
+    "Exhausted and memory-like subsets predicted response to anti-PD-1 therapy.",
+]
+
+
+def weights_available():
+    if os.path.isdir(pubmed_embeddings.MODEL_NAME):
+        return True
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return False
+    return isinstance(try_to_load_from_cache(pubmed_embeddings.MODEL_NAME, "config.json"), str)
+
+
+pytestmark = pytest.mark.skipif(not weights_available(), reason="PubMedBERT weights not available locally")
+
+
+def cosine_rows(a, b):
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    return np.sum(a * b, axis=1) / np.clip(norms, 1e-12, None)
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    return pubmed_embeddings.embed_texts(TEXTS, backend=pubmed_embeddings.load_backend("torch"))
+
+
+def test_torch_int8_matches_fp32(baseline):
+    embeddings = pubmed_embeddings.embed_texts(TEXTS, backend=pubmed_embeddings.load_backend("torch-int8"))
+    assert cosine_rows(embeddings, baseline).min() >= MIN_COSINE
+
+
+def test_onnx_matches_fp32(baseline, tmp_path):
+    pytest.importorskip("onnxruntime")
+    # Export into tmp_path rather than reusing (or writing) ONNX_MODEL_PATH
+    backend = pubmed_embeddings.OnnxBackend(onnx_path=str(tmp_path / "pubmedbert.onnx"))
+    embeddings = pubmed_embeddings.embed_texts(TEXTS, backend=backend)
+    assert cosine_rows(embeddings, baseline).min() >= MIN_COSINE
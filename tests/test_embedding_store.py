@@ -0,0 +1,86 @@
+import uuid
+
+import chromadb
+import mongomock
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore, MongoVectorStore, unit
+
+
+@pytest.fixture
+def collection():
+    # L2 space, like the pubmed_articles collection already on disk
+    client = chromadb.EphemeralClient()
+    return client.create_collection(f"test-{uuid.uuid4().hex[:8]}", configuration={"hnsw": {"space": "l2"}})
+
+
+def test_unit_normalises_rows_and_keeps_zero_vectors():
+    rows = unit(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    assert np.allclose(rows, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_nearest_orders_by_cosine_in_an_l2_collection(collection):
+    store = EmbeddingStore(collection, "model", "v1")
+    query = np.array([1.0, 0.0, 0.0])
+    store.put_many({
+        # Same direction as the query but far away in raw L2 terms
+        "aligned": (10 * query, 10 * query),
+        # Close in raw L2 terms, 45 degrees off
+        "nearby": (np.array([0.5, 0.5, 0.0]), np.array([0.5, 0.5, 0.0])),
+    })
+    assert store.nearest(query, n_results=2) == ["aligned", "nearby"]
+
+
+def test_vectors_without_normalized_flag_are_misses(collection):
+    store = EmbeddingStore(collection, "model", "v1")
+    collection.upsert(
+        ids=["1:title", "1:abstract"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0]],
+        metadatas=[{"pmid": "1", "field": f, "model": "model", "pooling": "v1"} for f in ("title", "abstract")],
+    )
+    assert store.get_many(["1"]) == {}
+    assert store.nearest(np.array([1.0, 0.0]), n_results=1) == []
+
+    store.put_many({"1": (np.array([2.0, 0.0]), np.array([0.0, 3.0]))})
+    title, abstract = store.get_many(["1"])["1"]
+    assert np.allclose(title, [1.0, 0.0]) and np.allclose(abstract, [0.0, 1.0])
+
+
+def test_open_store_recreates_an_empty_l2_collection_with_cosine(tmp_path):
+    from embedding_store import COLLECTION_NAME, open_store
+
+    chromadb.PersistentClient(path=str(tmp_path)).create_collection(
+        COLLECTION_NAME, configuration={"hnsw": {"space": "l2"}}
+    )
+    store = open_store("model", "v1", path=str(tmp_path))
+    assert store.collection.configuration["hnsw"]["space"] == "cosine"
+
+
+class VectorCollection:
+    """mongomock collection whose bulk_write takes pymongo ReplaceOne ops (mongomock 4.3 rejects their `sort`)."""
+
+    def __init__(self):
+        self.collection = mongomock.MongoClient()["pubmed_db"]["pubmed_vectors"]
+
+    def find(self, *args, **kwargs):
+        return self.collection.find(*args, **kwargs)
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self.collection.replace_one(op._filter, op._doc, upsert=op._upsert)
+
+
+def test_mongo_mirror_round_trips_current_vectors():
+    mirror = MongoVectorStore(VectorCollection(), "model", "v1")
+    mirror.put_many({"1": (np.array([3.0, 4.0]), np.array([0.0, 2.0]))})
+    title, abstract = mirror.get_many(["1", "2"])["1"]
+    assert np.allclose(title, [0.6, 0.8]) and np.allclose(abstract, [0.0, 1.0])
+    assert MongoVectorStore(mirror.collection, "other-model", "v1").get_many(["1"]) == {}
+
+
+def test_chroma_writes_are_mirrored(collection):
+    mirror = MongoVectorStore(VectorCollection(), "model", "v1")
+    store = EmbeddingStore(collection, "model", "v1", mirror=mirror)
+    store.put_many({"1": (np.array([1.0, 0.0]), np.array([0.0, 1.0]))})
+    assert set(mirror.get_many(["1"])) == {"1"}
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from hybrid_ranking import TITLE_BOOST, TermStats, bm25_scores, fuse, ranks, terms
+
+
+def stats_for(*articles):
+    term_stats = TermStats()
+    return [term_stats.get(a) for a in articles]
+
+
+def test_terms_drop_stopwords_and_single_characters():
+    assert terms("The role of IL-6 in a sepsis") == ["role", "il", "sepsis"]
+
+
+def test_title_occurrences_are_boosted():
+    tf, length = TermStats().get({"title": "Metformin", "abstract": "metformin and insulin"})
+    assert tf == {"metformin": 1 + TITLE_BOOST, "insulin": 1}
+    assert length == 2 + TITLE_BOOST
+
+
+def test_bm25_prefers_more_matches_and_reports_coverage():
+    stats = stats_for(
+        {"title": "Metformin in diabetes", "abstract": "metformin lowers glucose in diabetes"},
+        {"title": "Diabetes cohort", "abstract": "a cohort of patients"},
+        {"title": "Unrelated", "abstract": "nothing relevant"},
+    )
+    scores, coverage = bm25_scores(terms("metformin diabetes"), stats)
+    assert scores[0] > scores[1] > scores[2] == 0
+    assert coverage.tolist() == [1.0, 0.5, 0.0]
+
+
+def test_bm25_empty_inputs():
+    scores, coverage = bm25_scores([], stats_for({"title": "x", "abstract": "y"}))
+    assert scores.tolist() == [0.0] and coverage.tolist() == [0.0]
+    assert bm25_scores(["x"], [])[0].shape == (0,)
+
+
+def test_fuse_dense_or_no_sparse_signal_returns_dense():
+    dense = np.array([0.9, 0.5, 0.7])
+    assert fuse(dense, np.array([1.0, 2.0, 3.0]), "dense") is dense
+    assert fuse(dense, np.zeros(3), "rrf") is dense
+
+
+def test_rrf_combines_ranks():
+    dense, sparse = np.array([0.9, 0.8, 0.1]), np.array([0.0, 5.0, 1.0])
+    fused = fuse(dense, sparse, "rrf", rrf_k=60)
+    assert ranks(fused).tolist() == [1, 0, 2]
+    assert fused[1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_weighted_min_max_normalises_both_sides():
+    dense, sparse = np.array([0.8, 0.9, 0.7]), np.array([10.0, 0.0, 5.0])
+    fused = fuse(dense, sparse, "weighted", alpha=0.5)
+    assert fused.tolist() == pytest.approx([0.5 * 0.5 + 0.5 * 1.0, 0.5, 0.25])
+
+
+def test_unknown_method_raises():
+    with pytest.raises(ValueError):
+        fuse(np.ones(2), np.ones(2), "max")
@@ -0,0 +1,45 @@
+import json
+import os
+
+import pytest
+
+from ingest_baseline import Checkpoint
+
+
+def test_resumes_with_the_same_batch_size(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path, 256)
+    checkpoint.mark_batch("/data/a.xml.gz", 0, 256)
+    checkpoint.mark_total("/data/a.xml.gz", 2)
+    checkpoint.save()
+
+    resumed = Checkpoint(path, 256)
+    assert resumed.done_batches("/data/a.xml.gz") == {0}
+    assert not resumed.is_complete("/data/a.xml.gz")
+    assert json.load(open(path))["batch_size"] == 256
+
+
+def test_refuses_another_batch_size(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path, 256)
+    checkpoint.mark_batch("/data/a.xml.gz", 0, 256)
+    checkpoint.save()
+
+    with pytest.raises(ValueError, match="--batch 256"):
+        Checkpoint(path, 128)
+
+
+def test_refuses_a_checkpoint_without_batch_size(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text(json.dumps({"files": {"a.xml.gz": {"batches": [0], "total": None, "articles": 5}}}))
+    with pytest.raises(ValueError, match="unrecorded"):
+        Checkpoint(str(path), 256)
+
+
+def test_same_basename_in_two_directories_are_different_files(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"), 256)
+    first, second = os.path.abspath("2024/pubmed25n0001.xml.gz"), os.path.abspath("2025/pubmed25n0001.xml.gz")
+    checkpoint.mark_batch(first, 0, 10)
+    checkpoint.mark_total(first, 1)
+    assert checkpoint.is_complete(first)
+    assert not checkpoint.is_complete(second)
@@ -0,0 +1,51 @@
+import pytest
+
+from keyword_ranking import KeywordMatcher
+
+
+def test_terms_drop_stopwords_operators_and_duplicates():
+    assert KeywordMatcher("Cancer AND the cancer OR immunotherapy").terms == ["cancer", "immunotherapy"]
+
+
+def test_matches_whole_words_only():
+    matcher = KeywordMatcher("AI in cancer care")
+    text, found = matcher.highlight("Aim: aid cancerous carers.")
+    assert text == "Aim: aid cancerous carers."
+    assert found == set()
+    assert matcher.score(found, set()) == 0.0
+
+
+def test_plural_matches_and_counts_as_the_term():
+    text, found = KeywordMatcher("tumor cell").highlight("Tumors and cells")
+    assert text == "Tumors** and cells**"
+    assert found == {"tumor", "cell"}
+
+
+def test_phrase_is_one_span_and_finds_every_term():
+    text, found = KeywordMatcher("checkpoint inhibitor").highlight("A Checkpoint Inhibitor trial")
+    assert text == "A Checkpoint Inhibitor** trial"
+    assert found == {"checkpoint", "inhibitor"}
+
+
+def test_single_term_case_insensitive():
+    assert KeywordMatcher("crispr").highlight("CRISPR and crispr-cas9") == ("CRISPR** and crispr**-cas9", {"crispr"})
+
+
+@pytest.mark.parametrize("query", ["(a+)+$", "IL-6 [receptor] + C++ *inhibitor?", "\\d{3}"])
+def test_metacharacters_are_matched_literally(query):
+    matcher = KeywordMatcher(query)
+    assert matcher.highlight("aaaaaaaaaaaaaaaaaaaaaaaaaaaaaa!") == ("aaaaaaaaaaaaaaaaaaaaaaaaaaaaaa!", set())
+
+
+def test_no_terms_leaves_text_alone():
+    matcher = KeywordMatcher("the and of")
+    assert matcher.pattern is None
+    assert matcher.highlight("the cancer") == ("the cancer", set())
+    assert matcher.score(set(), set()) == 0.0
+
+
+def test_score_weights_title_double():
+    matcher = KeywordMatcher("cancer immunotherapy")
+    assert matcher.score({"cancer", "immunotherapy"}, set()) == pytest.approx(2 / 3)
+    assert matcher.score({"cancer"}, {"cancer", "immunotherapy"}) == pytest.approx(4 / 6)
+    assert matcher.score({"cancer", "immunotherapy"}, {"cancer", "immunotherapy"}) == 1.0
@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+
+from metrics import STAGE_SECONDS, UPSTREAM_ERRORS, UPSTREAM_SECONDS
+from pubmed_eutils import EUTILS_BASE_URL, EutilsClient, PubmedArticleParser, iter_pubmed_articles
+
+ESEARCH_XML = b"<eSearchResult><IdList><Id>1</Id><Id>2</Id></IdList></eSearchResult>"
+
+
+def histogram_sum(histogram, label):
+    return histogram._values.get((label,), [0.0])[-1]
+
+
+def client_with(handler, bucket=None):
+    client = EutilsClient(api_key="k", max_retries=1)
+    client._async_client = httpx.AsyncClient(base_url=EUTILS_BASE_URL, transport=httpx.MockTransport(handler))
+    if bucket is not None:
+        client.bucket = bucket
+    client._backoff = lambda attempt, response=None: 0
+    return client
+
+
+class SlowBucket:
+    async def acquire_async(self):
+        await asyncio.sleep(0.2)
+
+
+def test_rate_limit_wait_is_not_counted_as_ncbi_latency():
+    client = client_with(lambda request: httpx.Response(200, content=ESEARCH_XML), SlowBucket())
+    waited, upstream = histogram_sum(STAGE_SECONDS, "ncbi_rate_wait"), histogram_sum(UPSTREAM_SECONDS, "ncbi")
+
+    assert asyncio.run(client.aesearch("q")) == ["1", "2"]
+    assert histogram_sum(STAGE_SECONDS, "ncbi_rate_wait") - waited >= 0.2
+    assert histogram_sum(UPSTREAM_SECONDS, "ncbi") - upstream < 0.1
+
+
+def test_each_failed_attempt_counts_as_an_upstream_error():
+    statuses = iter([503, 200])
+    client = client_with(lambda request: httpx.Response(next(statuses), content=ESEARCH_XML))
+    errors = UPSTREAM_ERRORS._values.get(("ncbi",), 0)
+
+    assert asyncio.run(client.aesearch("q")) == ["1", "2"]
+    assert UPSTREAM_ERRORS._values[("ncbi",)] - errors == 1
+
+
+EFETCH_XML = b"""<?xml version="1.0" ?>
+<PubmedArticleSet>
+  <PubmedArticle>
+    <MedlineCitation>
+      <PMID>101</PMID>
+      <Article>
+        <Journal><Title>Nature</Title><JournalIssue><PubDate><Year>2020</Year></PubDate></JournalIssue></Journal>
+        <ArticleTitle>CRISPR screens</ArticleTitle>
+        <Abstract><AbstractText>First part.</AbstractText><AbstractText>Second part.</AbstractText></Abstract>
+        <AuthorList>
+          <Author><LastName>Doe</LastName><Initials>J</Initials></Author>
+          <Author><CollectiveName>Consortium</CollectiveName></Author>
+        </AuthorList>
+      </Article>
+    </MedlineCitation>
+  </PubmedArticle>
+  <PubmedArticle>
+    <MedlineCitation>
+      <PMID>102</PMID>
+      <Article><ArticleTitle>No abstract</ArticleTitle></Article>
+    </MedlineCitation>
+  </PubmedArticle>
+</PubmedArticleSet>
+"""
+
+
+def test_parser_extracts_articles_across_chunk_boundaries():
+    parser = PubmedArticleParser()
+    articles = []
+    for i in range(0, len(EFETCH_XML), 7):
+        articles.extend(parser.feed(EFETCH_XML[i:i + 7]))
+    articles.extend(parser.close())
+
+    assert [a["pmid"] for a in articles] == ["101", "102"]
+    first, second = articles
+    assert first == {
+        "pmid": "101", "title": "CRISPR screens", "abstract": "First part.", "journal": "Nature",
+        "year": "2020", "authors": ["Doe J"],
+    }
+    assert second["abstract"] is None and second["authors"] == []
+
+
+def test_parser_yields_each_article_as_soon_as_it_closes():
+    parser = PubmedArticleParser()
+    cut = EFETCH_XML.index(b"</PubmedArticle>") + len(b"</PubmedArticle>")
+    assert [a["pmid"] for a in parser.feed(EFETCH_XML[:cut])] == ["101"]
+    assert [a["pmid"] for a in parser.feed(EFETCH_XML[cut:]) + parser.close()] == ["102"]
+
+
+def test_finished_articles_are_released():
+    parser = PubmedArticleParser()
+    parser.feed(EFETCH_XML)
+    assert len(parser._root) == 0
+
+
+def test_iter_pubmed_articles_reads_chunks():
+    assert [a["pmid"] for a in iter_pubmed_articles([EFETCH_XML[:50], EFETCH_XML[50:]])] == ["101", "102"]
@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+import pytest
+from pymongo import AsyncMongoClient
+
+from check_query_plans import QUERIES, create_indexes, winning_stages
+
+# A scratch mongod; CI starts one as a service container
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI")
+pytestmark = pytest.mark.skipif(not MONGO_TEST_URI, reason="set MONGO_TEST_URI to a scratch mongod")
+
+
+async def explain(query):
+    client = AsyncMongoClient(MONGO_TEST_URI)
+    try:
+        db = client["query_plans_test"]
+        await create_indexes(db)
+        return await winning_stages(db, *query[1:])
+    finally:
+        await client.close()
+
+
+@pytest.mark.parametrize("query", QUERIES, ids=[q[0] for q in QUERIES])
+def test_query_uses_an_index(query):
+    stages = asyncio.run(explain(query))
+    assert "COLLSCAN" not in stages, " > ".join(stages)
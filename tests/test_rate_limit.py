@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from pubmed_eutils import EutilsClient, SharedRateLimit, TokenBucket
+
+
+def test_clients_sharing_a_collection_share_one_budget(mongo):
+    rate = 50
+    services = [EutilsClient(api_key="k", rate=rate, rate_collection=mongo["ncbi_rate_slots"]) for _ in range(2)]
+
+    async def main():
+        start = time.time()
+        await asyncio.gather(*(services[i % 2].bucket.acquire_async() for i in range(40)))
+        return time.time() - start
+
+    elapsed = asyncio.run(main())
+    # 40 requests at 50/s across both clients: one slot each, spread over ~0.8 s rather than 0.4 s per client
+    assert mongo["ncbi_rate_slots"].sync.count_documents({}) == 40
+    assert elapsed >= 0.7
+
+
+def test_at_most_rate_slots_per_second(mongo):
+    limiter = SharedRateLimit(mongo["ncbi_rate_slots"], 100, fallback=TokenBucket(100))
+
+    async def main():
+        await asyncio.gather(*(limiter.acquire_async() for _ in range(120)))
+
+    asyncio.run(main())
+    slots = [doc["_id"] for doc in mongo["ncbi_rate_slots"].sync.find()]
+    assert len(set(slots)) == 120
+    per_second = {}
+    for slot in slots:
+        per_second[slot // 100] = per_second.get(slot // 100, 0) + 1
+    assert max(per_second.values()) <= 100
+
+
+def test_falls_back_to_local_bucket_when_mongo_fails():
+    class Down:
+        async def insert_one(self, doc):
+            raise ConnectionError("no mongo")
+
+    fallback = TokenBucket(1000, capacity=5)
+    limiter = SharedRateLimit(Down(), 10, fallback=fallback)
+    asyncio.run(limiter.acquire_async())
+    assert fallback.tokens < 5
+
+
+def test_without_collection_client_uses_its_own_bucket():
+    assert isinstance(EutilsClient(api_key="k").bucket, TokenBucket)
+
+
+def test_concurrent_callers_in_one_process_do_not_collide(mongo):
+    collection = mongo["ncbi_rate_slots"]
+    inserts = []
+    insert_one = collection.insert_one
+
+    async def counting_insert(doc):
+        inserts.append(doc["_id"])
+        return await insert_one(doc)
+
+    collection.insert_one = counting_insert
+    limiter = SharedRateLimit(collection, 1000, fallback=TokenBucket(1000))
+
+    async def main():
+        await asyncio.gather(*(limiter.acquire_async() for _ in range(60)))
+
+    asyncio.run(main())
+    assert len(inserts) == 60
+
+
+def test_slots_taken_by_another_process_are_skipped(mongo):
+    collection = mongo["ncbi_rate_slots"]
+    limiter = SharedRateLimit(collection, 10, fallback=TokenBucket(10))
+    now_slot = int(time.time() * 10)
+    collection.sync.insert_many([{"_id": now_slot + i} for i in range(3)])
+
+    asyncio.run(limiter.acquire_async())
+    assert max(doc["_id"] for doc in collection.sync.find()) == now_slot + 3
+    assert limiter._next_slot == now_slot + 4
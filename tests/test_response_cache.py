@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from cache_utils import SemanticCache
+from chatbot_api import preprocess_query, same_subject
+
+# Paraphrases a shared answer may serve, and near-identical templates it must not
+SAME_QUESTION = [
+    ("What is CRISPR?", "Explain CRISPR"),
+    ("How does metformin work", "Explain how metformin works"),
+    ("Describe the role of T cells in cancer", "role of T cell in cancer?"),
+    ("Give me notes about insulin resistance", "insulin resistance"),
+    ("Explain CRISPR", "Explain CRISPR simply"),
+    ("What is apoptosis in simple terms", "Describe apoptosis in detail"),
+]
+DIFFERENT_QUESTION = [
+    ("What is the mechanism of metformin?", "What is the mechanism of aspirin?"),
+    ("Explain type 1 diabetes", "Explain type 2 diabetes"),
+    ("Role of IL-6 in sepsis", "Role of IL-10 in sepsis"),
+    ("Side effects of statins", "Side effects of statins in children"),
+    ("Explain CRISPR simply", "Explain Cas9 simply"),
+    ("Explain simply", "Explain in detail"),
+]
+
+
+@pytest.mark.parametrize("question,cached", SAME_QUESTION)
+def test_paraphrases_and_style_changes_share_a_subject(question, cached):
+    assert same_subject(preprocess_query(question), preprocess_query(cached))
+
+
+@pytest.mark.parametrize("question,cached", DIFFERENT_QUESTION)
+def test_different_subjects_do_not(question, cached):
+    assert not same_subject(preprocess_query(question), preprocess_query(cached))
+
+
+def test_semantic_hit_needs_accept():
+    near = np.array([1.0, 0.01])
+    cache = SemanticCache(threshold=0.9, accept=same_subject)
+    cache.set("mechanism of aspirin", "aspirin answer", np.array([1.0, 0.0]))
+    assert cache.get("mechanism of metformin", near) == (None, None)
+
+    cache.set("how does metformin work", "metformin answer", np.array([0.99, 0.1]))
+    assert cache.get("mechanism of metformin", near) == (None, None)
+    assert cache.get("explain metformin mechanism", near) == (None, None)
+    cache.set("metformin mechanism", "metformin mechanism answer", np.array([0.98, 0.2]))
+    # Less similar than the aspirin entry, but the only one about the same terms
+    assert cache.get("what is the mechanism of metformin", near) == ("metformin mechanism answer", "semantic")
+
+
+def test_without_accept_the_nearest_wins():
+    cache = SemanticCache(threshold=0.9)
+    cache.set("a", "first", np.array([1.0, 0.0]))
+    cache.set("b", "second", np.array([0.95, 0.3]))
+    assert cache.get("c", np.array([1.0, 0.05])) == ("first", "semantic")
+    assert cache.get("d", np.array([0.0, 1.0])) == (None, None)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import chatbot_api
+from hybrid_ranking import TermStats
+
+DIM = chatbot_api.EMBEDDING_DIM
+QUERY = np.eye(DIM, dtype=np.float32)[0]
+ARTICLES = [
+    {"pmid": "close", "title": "Unrelated words", "abstract": "nothing here"},
+    {"pmid": "far", "title": "Other topic", "abstract": "nothing here"},
+    {"pmid": "unscored-match", "title": "Metformin in diabetes", "abstract": "metformin lowers glucose"},
+    {"pmid": "unscored-other", "title": "Something else", "abstract": "nothing here"},
+]
+
+
+@pytest.fixture
+def rerank(monkeypatch):
+    """semantic_rerank over ARTICLES: close ~ query, far orthogonal, the last two left unembedded."""
+    vectors = np.zeros((len(ARTICLES), DIM), dtype=np.float32)
+    vectors[0] = QUERY
+    vectors[1, 1] = 1.0
+    monkeypatch.setattr(chatbot_api, "get_article_embeddings", lambda articles, **_: (vectors, vectors))
+    monkeypatch.setattr(chatbot_api, "term_stats", TermStats())
+
+    def run(fusion):
+        monkeypatch.setattr(chatbot_api, "HYBRID_FUSION", fusion)
+        ranked = chatbot_api.semantic_rerank("metformin diabetes", ARTICLES, top_k=10, query_embedding=QUERY)
+        return [a["pmid"] for a, _ in ranked]
+
+    return run
+
+
+@pytest.mark.parametrize("fusion", ["rrf", "weighted"])
+def test_unscored_articles_are_ranked_by_bm25(rerank, fusion):
+    order = rerank(fusion)
+    assert "far" not in order
+    # Unscored articles pass only on a BM25 match; "unscored-other" shares no query term
+    assert set(order) == {"close", "unscored-match"}
+
+
+def test_dense_mode_keeps_matching_unscored_articles_after_scored_ones(rerank):
+    assert rerank("dense") == ["close", "unscored-match"]
+
+
+def test_everything_scored_is_unchanged(monkeypatch):
+    vectors = np.stack([QUERY, np.eye(DIM, dtype=np.float32)[1]])
+    monkeypatch.setattr(chatbot_api, "get_article_embeddings", lambda articles, **_: (vectors, vectors))
+    monkeypatch.setattr(chatbot_api, "HYBRID_FUSION", "dense")
+    ranked = chatbot_api.semantic_rerank("q", ARTICLES[:2], top_k=10, query_embedding=QUERY)
+    assert [a["pmid"] for a, _ in ranked] == ["close"]
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime
+
+from single_flight import SingleFlight, flight_key
+
+
+def test_flight_key_is_stable_and_order_sensitive():
+    assert flight_key("chat", "Concept", "q") == flight_key("chat", "Concept", "q")
+    assert flight_key("chat", "Concept", "q") != flight_key("chat", "q", "Concept")
+
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", fn) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert flight.stats["leaders"] == 1 and flight.stats["coalesced"] == 4
+
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    async def fn():
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.create_task(flight.do("k", fn))
+        second = asyncio.create_task(flight.do("k", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "answer"
+
+
+def test_waiting_worker_takes_the_leaders_result_from_peek(mongo):
+    locks, results = mongo["inflight_locks"], mongo["results"]
+    leader_calls, follower_calls = [], []
+
+    async def leader_fn():
+        leader_calls.append(1)
+        await asyncio.sleep(0.05)
+        # Persisted inside the flight, before the lock is released
+        await results.insert_one({"_id": "k", "value": "answer"})
+        return "answer"
+
+    async def follower_fn():
+        follower_calls.append(1)
+        return "duplicate"
+
+    async def peek():
+        doc = await results.find_one({"_id": "k"})
+        return doc["value"] if doc else None
+
+    async def main():
+        leader = SingleFlight(locks, lock_ttl=5, poll_interval=0.01)
+        follower = SingleFlight(locks, lock_ttl=5, poll_interval=0.01)
+        leading = asyncio.create_task(leader.do("k", leader_fn, peek))
+        await asyncio.sleep(0.01)
+        waiting = await follower.do("k", follower_fn, peek)
+        return await leading, waiting, follower
+
+    led, waited, follower = asyncio.run(main())
+    assert led == waited == "answer"
+    assert len(leader_calls) == 1 and not follower_calls
+    assert follower.stats["remote_hits"] == 1
+    assert locks.sync.count_documents({}) == 0
+
+
+def test_follower_never_releases_the_leaders_lock(mongo):
+    locks = mongo["inflight_locks"]
+
+    async def main():
+        follower = SingleFlight(locks, lock_ttl=0.05, poll_interval=0.01)
+        await SingleFlight(locks)._acquire("k")
+        # The leader's lock outlives the wait, so the follower runs fn itself
+        return await follower.do("k", lambda: asyncio.sleep(0, result="own"))
+
+    assert asyncio.run(main()) == "own"
+    assert locks.sync.count_documents({"_id": "k"}) == 1
+
+
+def test_without_peek_a_worker_neither_locks_nor_waits(mongo):
+    locks = mongo["inflight_locks"]
+    locks.sync.insert_one({"_id": "k", "expires_at": datetime(2999, 1, 1)})
+
+    async def fn():
+        return "answer"
+
+    async def main():
+        flight = SingleFlight(locks, lock_ttl=30)
+        return flight, await asyncio.wait_for(flight.do("k", fn), timeout=1)
+
+    flight, result = asyncio.run(main())
+    assert result == "answer"
+    assert flight.stats["remote_waits"] == 0
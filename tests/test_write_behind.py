@@ -0,0 +1,95 @@
+import asyncio
+
+from write_behind import WriteBehindBuffer
+
+
+class RecordingCollection:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ConnectionError("mongo down")
+        self.batches.append(list(docs))
+
+    async def insert_one(self, doc):
+        self.batches.append([doc])
+
+
+def test_full_batch_is_written_without_waiting_for_the_timer():
+    async def main():
+        collection = RecordingCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=3, flush_ms=10_000)
+        buffer.start()
+        for i in range(3):
+            await buffer.add({"i": i})
+        for _ in range(10):
+            await asyncio.sleep(0)
+        await buffer.stop()
+        return collection.batches, buffer.stats()
+
+    batches, stats = asyncio.run(main())
+    assert batches == [[{"i": 0}, {"i": 1}, {"i": 2}]]
+    assert stats["written"] == 3 and stats["batches"] == 1
+
+
+def test_partial_batch_is_flushed_after_flush_ms():
+    async def main():
+        collection = RecordingCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=100, flush_ms=20)
+        buffer.start()
+        await buffer.add({"i": 0})
+        await asyncio.sleep(0.1)
+        written = list(collection.batches)
+        await buffer.stop()
+        return written
+
+    assert asyncio.run(main()) == [[{"i": 0}]]
+
+
+def test_stop_writes_everything_still_queued():
+    async def main():
+        collection = RecordingCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=2, flush_ms=10_000)
+        buffer.start()
+        for i in range(5):
+            await buffer.add({"i": i})
+        await buffer.stop()
+        return collection.batches
+
+    batches = asyncio.run(main())
+    assert [d["i"] for batch in batches for d in batch] == [0, 1, 2, 3, 4]
+    assert all(len(batch) <= 2 for batch in batches)
+
+
+def test_full_queue_drops_and_counts():
+    async def main():
+        buffer = WriteBehindBuffer(RecordingCollection(), max_batch=10, flush_ms=10_000, max_queue=2)
+        buffer.start()
+        for i in range(5):
+            await buffer.add({"i": i})
+        stats = buffer.stats()
+        await buffer.stop()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["queued"] == 2 and stats["dropped"] == 3
+
+
+def test_failed_insert_is_counted_not_raised():
+    async def main():
+        buffer = WriteBehindBuffer(RecordingCollection(fail=True), max_batch=1, flush_ms=10_000)
+        buffer.start()
+        await buffer.add({"i": 0})
+        await buffer.stop()
+        return buffer.stats()
+
+    assert asyncio.run(main())["failed"] == 1
+
+
+def test_not_started_writes_straight_through():
+    collection = RecordingCollection()
+    asyncio.run(WriteBehindBuffer(collection).add({"i": 0}))
+    assert collection.batches == [[{"i": 0}]]
@@ -0,0 +1,103 @@
+# -----------------------------
+# write_behind.py (batched, off-request-path inserts for search logs, shared by both services)
+# -----------------------------
+import asyncio
+import os
+
+from metrics import STAGE_SECONDS, UPSTREAM_ERRORS
+
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 100))
+LOG_FLUSH_MS = float(os.getenv("LOG_FLUSH_MS", 1000))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+
+class WriteBehindBuffer:
+    """Buffers documents for one async Mongo collection and writes them with insert_many.
+
+    `add(doc)` never waits: the document is queued and the request moves on. A single
+    consumer task writes a batch once `max_batch` documents are queued or `flush_ms`
+    after the first one arrived, whichever is first. The queue is bounded; when it is
+    full new documents are dropped (and counted) rather than growing memory. `stop()`
+    writes whatever is still queued.
+    """
+
+    def __init__(self, collection, max_batch=LOG_BATCH_SIZE, flush_ms=LOG_FLUSH_MS, max_queue=LOG_QUEUE_SIZE):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_ms / 1000
+        self.max_queue = max_queue
+        self.queue = None
+        self.task = None
+        self._pending = []  # taken off the queue, not yet written
+        self._writing = None
+        self.counters = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        # Flush on shutdown: the batch being written, the one being collected, then the queue
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        if self._pending:
+            batch, self._pending = self._pending, []
+            await self._write(batch)
+        while self.queue is not None and not self.queue.empty():
+            batch = [self.queue.get_nowait() for _ in range(min(self.max_batch, self.queue.qsize()))]
+            await self._write(batch)
+
+    async def add(self, doc):
+        if self.task is None:
+            # Not started (e.g. scripts, tests): write straight through
+            await self.collection.insert_one(doc)
+            return
+        try:
+            self.queue.put_nowait(doc)
+            self.counters["queued"] += 1
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+
+    async def _collect(self):
+        self._pending.append(await self.queue.get())
+        loop = asyncio.get_running_loop()
+        flush_at = loop.time() + self.flush_interval
+        while len(self._pending) < self.max_batch:
+            timeout = flush_at - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                self._pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _write(self, batch):
+        try:
+            # ordered=False: one bad document doesn't stop the rest of the batch
+            with STAGE_SECONDS.time(stage="mongo_insert"):
+                await self.collection.insert_many(batch, ordered=False)
+            self.counters["written"] += len(batch)
+            self.counters["batches"] += 1
+        except Exception as e:
+            self.counters["failed"] += len(batch)
+            UPSTREAM_ERRORS.inc(upstream="mongo")
+            print(f"⚠️ Write-behind insert of {len(batch)} documents failed: {e}")
+
+    async def _run(self):
+        while True:
+            await self._collect()
+            batch, self._pending = self._pending, []
+            # Shielded so shutdown never abandons a batch halfway through insert_many
+            self._writing = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._writing)
+
+    def stats(self):
+        return {
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue": self.max_queue,
+            **self.counters,
+        }